@@ -0,0 +1,320 @@
+import argparse
+import json
+import multiprocessing
+import multiprocessing.connection
+import os
+import time
+from collections import deque
+
+from graph import Node
+from solver import Algorithm, solve, path_moves, replay_moves
+from tube import State
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Algorithms of the benchmark, with their max depth
+DEFAULT_ALGORITHMS = [
+    (Algorithm.A_STAR, 30),
+    (Algorithm.GREEDY, 30),
+    (Algorithm.IDS, 60),
+    (Algorithm.DFS, 60),
+    (Algorithm.BFS, 15),
+]
+
+# Statuses of the jobs that ended on their own, any other one depends on the limits of the batch
+FINISHED = ('solved', 'failed')
+
+
+def load_levels(file: str = 'levels.json'):
+    """Load the tubes of each level
+
+    Args:
+        file (str, optional): Levels file. Defaults to 'levels.json'.
+
+    Returns:
+        dict: Balls of each tube by level name
+    """
+    with open(file) as f:
+        levels = json.load(f)
+    return {level: levels[level]['tubes'] for level in levels}
+
+
+def create_jobs(levels: dict, algorithms: list = None, params: dict = None):
+    """Create a job for every level and algorithm
+
+    Args:
+        levels (dict): Balls of each tube by level name
+        algorithms (list, optional): Algorithms with their max depth. Defaults to DEFAULT_ALGORITHMS.
+        params (dict, optional): Other arguments of the algorithms. Defaults to None.
+
+    Returns:
+        list: Jobs to run
+    """
+    if algorithms is None:
+        algorithms = DEFAULT_ALGORITHMS
+
+    jobs = []
+    for level, tubes in levels.items():
+        for algorithm, max_depth in algorithms:
+            jobs.append({
+                'level': level,
+                'tubes': tubes,
+                'capacity': level_capacity(tubes),
+                'algorithm': algorithm.name,
+                'max_depth': max_depth,
+                'params': params or {},
+            })
+    return jobs
+
+
+def level_capacity(tubes: list):
+    """Capacity of the tubes of a level
+
+    Every color has a ball for each place of a tube, so the capacity is
+    the number of balls of any color.
+
+    Args:
+        tubes (list): Balls of each tube
+
+    Returns:
+        int: Capacity of the tubes, 4 if there are no balls
+    """
+    balls = [ball for tube in tubes for ball in tube]
+    if not balls:
+        return 4
+    return balls.count(balls[0])
+
+
+def job_id(job: dict):
+    """Identifier of a job, used to resume a batch
+
+    Args:
+        job (dict): Job
+
+    Returns:
+        str: Identifier of the job
+    """
+    return '{}/{}/{}/{}'.format(job['level'], job['algorithm'], job['max_depth'],
+                                json.dumps(job['params'], sort_keys=True))
+
+
+def run_job(job: dict, memory: int = None):
+    """Run a job in the current process
+
+    Args:
+        job (dict): Job to run
+        memory (int, optional): Memory limit of the process, in MB. Defaults to None.
+
+    Returns:
+        dict: Result of the job
+    """
+    if memory is not None and resource is not None:
+        limit = memory * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    state = State(tuple(tuple(balls) for balls in job['tubes']), job.get('capacity', 4))
+    result = job_result(job, None)
+    start = time.perf_counter()
+    try:
+        graph, goal = solve(Node(state), Algorithm[job['algorithm']], job['max_depth'], **job['params'])
+        result['status'] = 'solved' if goal is not None else 'failed'
+        result['expanded'] = graph.expanded_states()
+        result['generated'] = graph.generated
+        result['max_frontier'] = graph.max_frontier
+        result['length'] = None
+        if goal is not None:
+            moves = path_moves(graph.path(goal))
+            result['length'] = len(moves)
+            # The moves must solve the start state, not only the solution node
+            final = replay_moves(state, moves)
+            if final is None or not final.finished():
+                result['status'] = 'invalid'
+    except MemoryError:
+        result['status'] = 'memory'
+    result['time'] = time.perf_counter() - start
+    if 'expanded' in result and result['time'] > 0:
+        result['nodes_per_sec'] = result['expanded'] / result['time']
+    result['peak_rss'] = peak_rss()
+    return result
+
+
+def job_result(job: dict, status: str):
+    """Create the result of a job
+
+    Args:
+        job (dict): Job
+        status (str): Status of the job
+
+    Returns:
+        dict: Result with the job's information and status
+    """
+    return {'id': job_id(job), 'level': job['level'], 'algorithm': job['algorithm'],
+            'max_depth': job['max_depth'], 'capacity': job.get('capacity'),
+            'colors': len({ball for balls in job['tubes'] for ball in balls}), 'params': job['params'],
+            'status': status}
+
+
+def peak_rss():
+    """Peak resident memory of the current process
+
+    Returns:
+        int: Peak memory in KB, None if it isn't available in this system
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if os.uname().sysname == 'Darwin':
+        rss //= 1024
+    return rss
+
+
+def job_worker(job: dict, memory: int, conn):
+    """Worker process of a batch, runs a single job
+
+    Args:
+        job (dict): Job to run
+        memory (int): Memory limit of the process, in MB
+        conn (Connection): Connection where the result is sent
+    """
+    try:
+        conn.send(run_job(job, memory))
+    except Exception as e:
+        result = job_result(job, 'error')
+        result['error'] = repr(e)
+        conn.send(result)
+    conn.close()
+
+
+def load_results(output: str):
+    """Load the results already written to a file
+
+    Args:
+        output (str): Results file, in JSON lines
+
+    Returns:
+        dict: Results by job identifier
+    """
+    results = {}
+    if not os.path.exists(output):
+        return results
+    with open(output) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+            results[result['id']] = result
+    return results
+
+
+def run_batch(jobs: list, output: str, workers: int = None, timeout: float = None, memory: int = None,
+              on_result=None, resume: bool = False):
+    """Run jobs in parallel, each one in its own process
+
+    Each result is written to the output file as soon as the job ends.
+    When resuming, the file is appended to and the jobs that already have
+    a finished result in it are skipped, so a stopped batch can go on. The
+    jobs that timed out, ran out of memory or failed with an error run
+    again, since the limits may have changed. Otherwise
+    the file is started again, so no result of an older run is reused. A
+    job that takes longer than the timeout is terminated and saved with
+    the timeout status.
+
+    Args:
+        jobs (list): Jobs to run
+        output (str): Results file, in JSON lines
+        workers (int, optional): Number of jobs at the same time. Defaults to the number of CPUs.
+        timeout (float, optional): Maximum time of a job, in seconds. Defaults to None.
+        memory (int, optional): Maximum memory of a job, in MB. Defaults to None.
+        on_result (function, optional): Function called with each new result. Defaults to None.
+        resume (bool, optional): Keep the results already in the file. Defaults to False.
+
+    Returns:
+        dict: Results by job identifier, including the ones loaded from the file
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    results = load_results(output) if resume else {}
+    pending = deque(job for job in jobs if results.get(job_id(job), {}).get('status') not in FINISHED)
+    running = {}
+
+    with open(output, 'a' if resume else 'w') as f:
+        while pending or running:
+            while pending and len(running) < workers:
+                job = pending.popleft()
+                receiver, sender = multiprocessing.Pipe(False)
+                process = multiprocessing.Process(target=job_worker, args=(job, memory, sender), daemon=True)
+                process.start()
+                sender.close()
+                running[receiver] = (process, job, time.perf_counter())
+
+            multiprocessing.connection.wait(list(running), timeout=0.1)
+
+            for receiver in list(running):
+                process, job, start = running[receiver]
+                result = None
+                if receiver.poll():
+                    try:
+                        result = receiver.recv()
+                    except EOFError:
+                        result = None
+                    if result is None:
+                        result = job_result(job, 'memory' if process.exitcode else 'error')
+                elif timeout is not None and time.perf_counter() - start > timeout:
+                    process.terminate()
+                    result = job_result(job, 'timeout')
+                    result['time'] = timeout
+                else:
+                    continue
+
+                process.join()
+                receiver.close()
+                del running[receiver]
+
+                results[result['id']] = result
+                f.write(json.dumps(result) + '\n')
+                f.flush()
+                if on_result is not None:
+                    on_result(result)
+
+    return results
+
+
+def parse_args():
+    """Parse the command line arguments
+
+    Returns:
+        Namespace: Arguments
+    """
+    parser = argparse.ArgumentParser(description='Run the solver algorithms on every level in parallel')
+    parser.add_argument('--levels', default='levels.json', help='levels file')
+    parser.add_argument('--output', default='results.jsonl', help='results file')
+    parser.add_argument('--resume', action='store_true', help='keep the results already in the output file')
+    parser.add_argument('--algorithms', nargs='+', metavar='ALGORITHM:DEPTH',
+                        help='algorithms with their max depth, e.g. A_STAR:30')
+    parser.add_argument('--workers', type=int, default=None, help='jobs at the same time')
+    parser.add_argument('--timeout', type=float, default=None, help='maximum seconds per job')
+    parser.add_argument('--memory', type=int, default=None, help='maximum MB per job')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    algorithms = None
+    if args.algorithms:
+        algorithms = []
+        for arg in args.algorithms:
+            name, depth = arg.split(':')
+            algorithms.append((Algorithm[name], int(depth)))
+
+    jobs = create_jobs(load_levels(args.levels), algorithms)
+    run_batch(jobs, args.output, args.workers, args.timeout, args.memory,
+              lambda x: print(x['level'], x['algorithm'], x['status'], round(x.get('time', 0), 3)), args.resume)
@@ -0,0 +1,332 @@
+import argparse
+import csv
+import json
+import random
+import sys
+
+from batch import load_levels, create_jobs, run_batch, DEFAULT_ALGORITHMS
+from generator import scramble
+from solver import Algorithm, generate_puzzle
+
+# Algorithm whose solutions are taken as optimal to calculate the optimality gap
+REFERENCE = (Algorithm.IDA_STAR, 60)
+
+# Algorithms of the scaling benchmark, the ones that still work on big puzzles
+SCALING_ALGORITHMS = [
+    (Algorithm.GREEDY, 1000),
+    (Algorithm.BEAM, 1000),
+    (Algorithm.A_STAR, 1000),
+    (Algorithm.VECTOR_BFS, 1000),
+]
+
+# Columns of the results, in the CSV file
+COLUMNS = ['level', 'algorithm', 'max_depth', 'capacity', 'colors', 'status', 'length', 'optimality_gap',
+           'expanded', 'generated', 'max_frontier', 'time', 'nodes_per_sec', 'peak_rss']
+
+# Maximum ratio between the new value and the baseline before it is a regression
+DEFAULT_THRESHOLDS = {
+    'time': 1.25,
+    'expanded': 1.10,
+    'peak_rss': 1.25,
+}
+
+# Baseline times below this, in seconds, are too noisy to compare
+MIN_TIME = 0.05
+
+
+def create_instances(levels_file: str = 'levels.json', colors: list = None, count: int = 3, seed: int = 0):
+    """Create the instances of the benchmark
+
+    The instances are the levels plus generated puzzles, which have a
+    fixed seed, so they are the same in every run.
+
+    Args:
+        levels_file (str, optional): Levels file. Defaults to 'levels.json'.
+        colors (list, optional): Number of colors of the generated puzzles. Defaults to [5, 7].
+        count (int, optional): Number of generated puzzles for each number of colors. Defaults to 3.
+        seed (int, optional): Seed of the first generated puzzle. Defaults to 0.
+
+    Returns:
+        dict: Balls of each tube by instance name
+    """
+    if colors is None:
+        colors = [5, 7]
+
+    instances = load_levels(levels_file)
+    for num in colors:
+        for i in range(count):
+            game = generate_puzzle(num, seed + i)
+            instances['gen-{}-{}'.format(num, seed + i)] = [tube.balls for tube in game.tubes]
+    return instances
+
+
+def create_scaling_instances(capacities: list = None, colors: list = None, count: int = 1, seed: int = 0,
+                             empty: int = 2):
+    """Create puzzles of growing size, to see how the algorithms scale
+
+    The puzzles are scrambled from the solved state, so all of them can
+    be solved, with a fixed seed.
+
+    Args:
+        capacities (list, optional): Capacities of the tubes. Defaults to 4 to 8.
+        colors (list, optional): Numbers of colors. Defaults to 5 to 25, every 5.
+        count (int, optional): Number of puzzles of each size. Defaults to 1.
+        seed (int, optional): Seed of the puzzles. Defaults to 0.
+        empty (int, optional): Number of empty tubes. Defaults to 2.
+
+    Returns:
+        dict: Balls of each tube by instance name
+    """
+    if capacities is None:
+        capacities = [4, 5, 6, 7, 8]
+    if colors is None:
+        colors = [5, 10, 15, 20, 25]
+
+    instances = {}
+    for capacity in capacities:
+        for num in colors:
+            rng = random.Random('{}-{}-{}'.format(seed, capacity, num))
+            for i in range(count):
+                state = scramble(num, capacity, empty, rng=rng)
+                instances['scale-{}-{}-{}'.format(capacity, num, i)] = [list(balls) for balls in state.tubes]
+    return instances
+
+
+def scaling_report(results: list):
+    """Summarize how the time and memory of each algorithm grow with the size
+
+    The results of each algorithm and size (capacity and colors) are
+    averaged over the solved puzzles, and compared with the previous
+    number of colors of the same capacity.
+
+    Args:
+        results (list): Results of the scaling benchmark
+
+    Returns:
+        list: Row of each algorithm and size, with the solved puzzles, the mean time, peak memory and
+            expanded states, and the growth of the time and memory
+    """
+    groups = {}
+    for result in results:
+        key = (result['algorithm'], result.get('capacity'), result.get('colors'))
+        groups.setdefault(key, []).append(result)
+
+    rows = []
+    previous = {}
+    for (algorithm, capacity, colors), group in sorted(groups.items(), key=lambda x: (x[0][0], x[0][1] or 0,
+                                                                                        x[0][2] or 0)):
+        solved = [x for x in group if x['status'] == 'solved']
+        row = {'algorithm': algorithm, 'capacity': capacity, 'colors': colors,
+               'solved': len(solved), 'instances': len(group)}
+        for measure in ('time', 'peak_rss', 'expanded'):
+            values = [x[measure] for x in solved if x.get(measure) is not None]
+            row[measure] = sum(values) / len(values) if values else None
+
+        before = previous.get((algorithm, capacity))
+        for measure in ('time', 'peak_rss'):
+            if before is not None and before[measure] and row[measure] is not None:
+                row[measure + '_growth'] = row[measure] / before[measure]
+            else:
+                row[measure + '_growth'] = None
+        previous[(algorithm, capacity)] = row
+        rows.append(row)
+    return rows
+
+
+def print_scaling_report(rows: list):
+    """Print the scaling summary as a table
+
+    Args:
+        rows (list): Rows of scaling_report
+    """
+    def show(value, fmt):
+        return fmt.format(value) if value is not None else '-'
+
+    print('{:<12} {:>8} {:>6} {:>7} {:>10} {:>8} {:>12} {:>8} {:>12}'.format(
+        'algorithm', 'capacity', 'colors', 'solved', 'time', 'growth', 'peak_rss', 'growth', 'expanded'))
+    for row in rows:
+        print('{:<12} {:>8} {:>6} {:>7} {:>10} {:>8} {:>12} {:>8} {:>12}'.format(
+            row['algorithm'], row['capacity'], row['colors'], '{}/{}'.format(row['solved'], row['instances']),
+            show(row['time'], '{:.3f}'), show(row['time_growth'], 'x{:.1f}'),
+            show(row['peak_rss'], '{:.0f}'), show(row['peak_rss_growth'], 'x{:.1f}'),
+            show(row['expanded'], '{:.0f}')))
+
+
+def add_optimality_gaps(results: list, reference: tuple = REFERENCE):
+    """Add the optimality gap to each result
+
+    The gap is how much longer the solution is than the reference
+    algorithm's, 0 being optimal. It is None when either wasn't solved.
+
+    Args:
+        results (list): Results of the benchmark
+        reference (tuple, optional): Algorithm and max depth of the optimal solutions. Defaults to REFERENCE.
+    """
+    optimal = {}
+    for result in results:
+        if result['algorithm'] == reference[0].name and result['status'] == 'solved':
+            optimal[result['level']] = result['length']
+
+    for result in results:
+        best = optimal.get(result['level'])
+        if result['status'] == 'solved' and best:
+            result['optimality_gap'] = result['length'] / best - 1
+        else:
+            result['optimality_gap'] = None
+
+
+def run_benchmark(instances: dict, output: str, algorithms: list = None, reference: tuple = REFERENCE,
+                  workers: int = None, timeout: float = None, memory: int = None, resume: bool = False):
+    """Run the benchmark on every instance
+
+    Args:
+        instances (dict): Balls of each tube by instance name
+        output (str): Results file of the batch, in JSON lines
+        algorithms (list, optional): Algorithms with their max depth. Defaults to DEFAULT_ALGORITHMS.
+        reference (tuple, optional): Algorithm and max depth of the optimal solutions. Defaults to REFERENCE.
+        workers (int, optional): Number of jobs at the same time. Defaults to the number of CPUs.
+        timeout (float, optional): Maximum time of a job, in seconds. Defaults to None.
+        memory (int, optional): Maximum memory of a job, in MB. Defaults to None.
+        resume (bool, optional): Keep the results already in the batch file, e.g. after the
+            benchmark was stopped. Defaults to False.
+
+    Returns:
+        list: Results, sorted by instance and algorithm
+    """
+    if algorithms is None:
+        algorithms = DEFAULT_ALGORITHMS
+    if reference is not None and reference not in algorithms:
+        algorithms = algorithms + [reference]
+
+    jobs = create_jobs(instances, algorithms)
+    ids = set()
+    for job in jobs:
+        ids.add((job['level'], job['algorithm'], job['max_depth']))
+
+    results = [result for result in run_batch(jobs, output, workers, timeout, memory, resume=resume).values()
+               if (result['level'], result['algorithm'], result.get('max_depth')) in ids]
+    order = list(instances)
+    results.sort(key=lambda x: (order.index(x['level']), x['algorithm']))
+
+    if reference is not None:
+        add_optimality_gaps(results, reference)
+    return results
+
+
+def write_json(results: list, path: str):
+    """Save the results to a JSON file
+
+    Args:
+        results (list): Results of the benchmark
+        path (str): JSON file
+    """
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def write_csv(results: list, path: str):
+    """Save the results to a CSV file
+
+    Args:
+        results (list): Results of the benchmark
+        path (str): CSV file
+    """
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def compare(results: list, baseline: list, thresholds: dict = None):
+    """Compare the results with a baseline
+
+    A result is a regression if it was solved in the baseline and now
+    isn't, if its solution is longer, or if any of the measures grew more
+    than its threshold. Times shorter than MIN_TIME aren't compared.
+
+    Args:
+        results (list): Results of the benchmark
+        baseline (list): Results of a previous run
+        thresholds (dict, optional): Maximum ratio of each measure. Defaults to DEFAULT_THRESHOLDS.
+
+    Returns:
+        list: Description of each regression
+    """
+    if thresholds is None:
+        thresholds = DEFAULT_THRESHOLDS
+
+    old = {(x['level'], x['algorithm'], x.get('max_depth')): x for x in baseline}
+    regressions = []
+    for result in results:
+        before = old.get((result['level'], result['algorithm'], result.get('max_depth')))
+        if before is None or before['status'] != 'solved':
+            continue
+
+        name = '{} {}'.format(result['level'], result['algorithm'])
+        if result['status'] != 'solved':
+            regressions.append('{}: {} (was solved)'.format(name, result['status']))
+            continue
+        if result['length'] > before['length']:
+            regressions.append('{}: length {} > {}'.format(name, result['length'], before['length']))
+        for measure, threshold in thresholds.items():
+            if not before.get(measure) or result.get(measure) is None:
+                continue
+            if measure == 'time' and before[measure] < MIN_TIME:
+                continue
+            ratio = result[measure] / before[measure]
+            if ratio > threshold:
+                regressions.append('{}: {} x{:.2f} > x{:.2f}'.format(name, measure, ratio, threshold))
+    return regressions
+
+
+def parse_args():
+    """Parse the command line arguments
+
+    Returns:
+        Namespace: Arguments
+    """
+    parser = argparse.ArgumentParser(description='Benchmark the solver algorithms')
+    parser.add_argument('--levels', default='levels.json', help='levels file')
+    parser.add_argument('--colors', type=int, nargs='*', default=[5, 7], help='colors of the generated puzzles')
+    parser.add_argument('--count', type=int, default=3, help='generated puzzles for each number of colors')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated puzzles')
+    parser.add_argument('--output', default='benchmark.json', help='JSON results file')
+    parser.add_argument('--csv', default=None, help='CSV results file')
+    parser.add_argument('--baseline', default=None, help='JSON results to compare with')
+    parser.add_argument('--resume', action='store_true',
+                        help='keep the results of a stopped run, saved in the output file with an l appended')
+    parser.add_argument('--workers', type=int, default=None, help='jobs at the same time')
+    parser.add_argument('--timeout', type=float, default=60, help='maximum seconds per job')
+    parser.add_argument('--memory', type=int, default=None, help='maximum MB per job')
+    parser.add_argument('--scaling', action='store_true',
+                        help='benchmark scrambled puzzles of growing capacity and colors instead of the levels')
+    parser.add_argument('--capacities', type=int, nargs='*', default=[4, 5, 6, 7, 8],
+                        help='capacities of the scaling puzzles')
+    parser.add_argument('--scaling-colors', type=int, nargs='*', default=[5, 10, 15, 20, 25],
+                        help='colors of the scaling puzzles')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.scaling:
+        instances = create_scaling_instances(args.capacities, args.scaling_colors, args.count, args.seed)
+        results = run_benchmark(instances, args.output + 'l', SCALING_ALGORITHMS, None, args.workers,
+                                args.timeout, args.memory, args.resume)
+        print_scaling_report(scaling_report(results))
+    else:
+        instances = create_instances(args.levels, args.colors, args.count, args.seed)
+        results = run_benchmark(instances, args.output + 'l', workers=args.workers, timeout=args.timeout,
+                                memory=args.memory, resume=args.resume)
+    write_json(results, args.output)
+    if args.csv is not None:
+        write_csv(results, args.csv)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f))
+        for regression in regressions:
+            print(regression)
+        if regressions:
+            sys.exit(1)
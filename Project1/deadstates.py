@@ -0,0 +1,182 @@
+import threading
+from collections import OrderedDict
+
+from tube import State, find_moves
+
+class DeadStates:
+    def __init__(self, max_states: int = 100000, closure: int = 0) -> None:
+        """Initializes DeadStates, a bounded cache of states that can't be solved
+
+        The states are keyed by their sorted tubes, so a dead state is also
+        found with the tubes in another order. The same cache can be shared by several
+        searches, also from other threads. When there are more than
+        max_states states, the least recently used ones are forgotten.
+
+        Args:
+            max_states (int, optional): Maximum number of states kept. Defaults to 100000.
+            closure (int, optional): Maximum number of states explored to prove that a state with
+                a single move is dead, e.g. 16. It seldom pays off with two empty tubes. Defaults to 0,
+                not to try.
+        """
+        self.max_states = max_states
+        self.closure = closure
+        self.lock = threading.Lock()
+        self.states = OrderedDict()
+        self.hits = 0
+
+    def __contains__(self, state: State):
+        """Check if a state is known to be dead, and mark it as used
+
+        Args:
+            state (State): State to look for
+
+        Returns:
+            boolean: True if the state can't be solved
+        """
+        key = dead_key(state)
+        with self.lock:
+            if key not in self.states:
+                return False
+            self.states.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def __len__(self):
+        """Number of dead states kept
+
+        Returns:
+            int: Number of states
+        """
+        return len(self.states)
+
+    def add(self, state: State):
+        """Save a state that can't be solved
+
+        Args:
+            state (State): Dead state
+        """
+        self.update([dead_key(state)])
+
+    def update(self, keys):
+        """Save the keys of dead states, e.g. the ones found by another process
+
+        Args:
+            keys (iterable): Keys of dead states, see dead_key
+        """
+        with self.lock:
+            for key in keys:
+                self.states[key] = True
+                self.states.move_to_end(key)
+            while len(self.states) > self.max_states:
+                self.states.popitem(last=False)
+
+    def keys(self):
+        """Keys of the dead states, to send them to another process
+
+        Returns:
+            list: Keys of the dead states, the most recently used last
+        """
+        with self.lock:
+            return list(self.states)
+
+    def prune(self, node, children: list, pruned: dict = None, prove: bool = True):
+        """Remove the children of a node that are known to be dead
+
+        The node keeps the number of children left in node.live, so
+        resolve can prove that the node is dead when all of them are. A
+        node with a single child is also dead when the states it can reach
+        are only a few and none of them is solved.
+
+        Args:
+            node (Node): Expanded node
+            children (list): Children of the node
+            pruned (dict, optional): Counts of pruned moves by reason, updated here. Defaults to None.
+            prove (bool, optional): Count the children to prove that the node is dead, only valid
+                when the children are single ball moves. Defaults to True.
+
+        Returns:
+            list: Children worth searching
+        """
+        node.trapped = []
+        kept = [child for child in children if child.state not in self]
+        if pruned is not None and len(kept) < len(children):
+            pruned['dead'] = pruned.get('dead', 0) + len(children) - len(kept)
+        if prove and len(kept) == 1 and self.closure > 0:
+            reachable = closed_states(node.state, self.closure)
+            if reachable is not None:
+                self.update(dead_key(x) for x in reachable)
+                if pruned is not None:
+                    pruned['dead'] = pruned.get('dead', 0) + 1
+                kept = []
+        node.live = len(kept) if prove else None
+        return kept
+
+    def resolve(self, node):
+        """Save the states proven dead after a node ran out of children
+
+        The useless moves were already removed, so a node without children
+        left is dead, unless the last move can be undone. Then it can only
+        be solved through its parent, so it is trapped and dead if the
+        parent is. Each parent with no children left is resolved in turn,
+        up to the start node.
+
+        Args:
+            node (Node): Node without children left, or known to be dead
+        """
+        trapped = getattr(node, 'trapped', []) + [node.state]
+        while True:
+            if node.move is None or node.state.apply_move(node.move[1], node.move[0]) is None:
+                self.update(dead_key(x) for x in trapped)
+                trapped = []
+            parent = node.parent
+            if parent is None or getattr(parent, 'live', None) is None:
+                return
+            parent.live -= 1
+            parent.trapped.extend(trapped)
+            if parent.live > 0:
+                return
+            node = parent
+            trapped = node.trapped + [node.state]
+
+
+def dead_key(state: State):
+    """Key of a state in the cache
+
+    The tubes are sorted, so the order of the tubes doesn't matter, and
+    prefixed by the capacity. They aren't packed like in the canonical key,
+    which takes longer than the lookup itself.
+
+    Args:
+        state (State): State
+
+    Returns:
+        tuple: Key of the state
+    """
+    return state.capacity, tuple(sorted(state.tubes))
+
+
+def closed_states(state: State, limit: int):
+    """All the states reachable from a state, if they are few and none is solved
+
+    Args:
+        state (State): Start state
+        limit (int): Maximum number of states explored
+
+    Returns:
+        list: Reachable states, None if there are more than limit or one of them is solved
+    """
+    seen = {state.tubes: state}
+    stack = [state]
+    while stack:
+        current = stack.pop()
+        if current.finished():
+            return None
+        for from_i, to_i in find_moves(current.tubes, current.capacity):
+            child = current.apply_move(from_i, to_i)
+            key = child.tubes
+            if key not in seen:
+                if len(seen) == limit:
+                    return None
+                seen[key] = child
+                stack.append(child)
+    return list(seen.values())
@@ -0,0 +1,144 @@
+import heapq
+import itertools
+from collections import deque
+
+
+class QueueFrontier:
+    def __init__(self) -> None:
+        """Initializes a FIFO frontier, used by BFS
+        """
+        self.nodes = deque()
+
+    def push(self, node):
+        """Add a node to the end of the frontier
+
+        Args:
+            node (Node): Node to add
+        """
+        self.nodes.append(node)
+
+    def extend(self, nodes: list):
+        """Add nodes to the frontier
+
+        Args:
+            nodes (list): Nodes to add, in the order they should be expanded
+        """
+        for node in nodes:
+            self.push(node)
+
+    def pop(self):
+        """Remove the next node to expand
+
+        Returns:
+            Node: Oldest node in the frontier
+        """
+        return self.nodes.popleft()
+
+    def __len__(self):
+        """Number of nodes in the frontier
+
+        Returns:
+            int: Number of nodes
+        """
+        return len(self.nodes)
+
+
+class StackFrontier(QueueFrontier):
+    def extend(self, nodes: list):
+        """Add nodes to the top of the frontier, used by DFS/IDS
+
+        The nodes are pushed in reverse so the first one is expanded first,
+        just like putting the new list in front of the stack.
+
+        Args:
+            nodes (list): Nodes to add, in the order they should be expanded
+        """
+        for node in reversed(nodes):
+            self.push(node)
+
+    def pop(self):
+        """Remove the next node to expand
+
+        Returns:
+            Node: Newest node in the frontier
+        """
+        return self.nodes.pop()
+
+
+class PriorityFrontier:
+    def __init__(self, priority) -> None:
+        """Initializes a binary heap frontier, used by Greedy and A*
+
+        Ties on the priority are broken by the heuristics cost and then
+        by insertion order. Only the best node of every gamestate is kept
+        alive: when a better one is pushed, the old heap entry becomes stale
+        and is skipped when popped (lazy deletion).
+
+        Args:
+            priority (function): Function that gives the priority of a node, lower first
+        """
+        self.heap = []
+        self.index = {}
+        self.counter = itertools.count()
+        self.priority = priority
+
+    def push(self, node):
+        """Add a node to the frontier, unless a node with the same gamestate and
+        a better or equal priority is already there
+
+        Args:
+            node (Node): Node to add
+
+        Returns:
+            boolean: True if the node was added, False otherwise
+        """
+        priority = self.priority(node)
+        key = node.key()
+        old = self.index.get(key)
+        if old is not None and self.priority(old) <= priority:
+            return False
+
+        self.index[key] = node
+        heapq.heappush(self.heap, (priority, node.cost, next(self.counter), node))
+        return True
+
+    def extend(self, nodes: list):
+        """Add nodes to the frontier
+
+        Args:
+            nodes (list): Nodes to add
+        """
+        for node in nodes:
+            self.push(node)
+
+    def pop(self):
+        """Remove the node with the lowest priority
+
+        Returns:
+            Node: Next node to expand
+        """
+        while True:
+            node = heapq.heappop(self.heap)[-1]
+            key = node.key()
+            if self.index.get(key) is node:
+                del self.index[key]
+                return node
+
+    def get(self, node):
+        """Get the node in the frontier with the same gamestate
+
+        Args:
+            node (Node): Node to look for
+
+        Returns:
+            Node: Node in the frontier, if found, None otherwise
+        """
+        return self.index.get(node.key())
+
+    def __len__(self):
+        """Number of live nodes in the frontier
+
+        Returns:
+            int: Number of nodes, without the stale heap entries
+        """
+        return len(self.index)
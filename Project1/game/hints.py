@@ -0,0 +1,135 @@
+import threading
+
+from graph import Graph, Node
+from portfolio import portfolio, OPTIMAL_PORTFOLIO
+from solver import path_moves
+from tube import State
+
+
+# Hint Engine Class
+
+class HintEngine:
+    def __init__(self, solutions=None, timeout=20, dead=None):
+        """Keeps a plan to solve the current game, found in a worker thread
+
+        When the player makes the suggested move of a plan known to be
+        optimal, the plan just advances, since the rest of a shortest plan
+        is a shortest plan too. Any other plan is searched again.
+        Otherwise the new state is looked up in the solutions database and,
+        if it isn't there, a new plan is searched in the background, so
+        the main loop never waits for the solver. Only optimal algorithms
+        search it, so the final plan is a shortest one. Until then, the
+        better and better plans of ARA* are shown, but they are searched
+        again when followed. A state known to be dead fails at once, without
+        searching it again.
+
+        Args:
+            solutions (SolutionDB, optional): Database of known solutions. Defaults to None.
+            timeout (int, optional): Time limit of a search, in seconds. Defaults to 20.
+            dead (DeadStates, optional): Cache of dead states shared by every search. Defaults to None.
+        """
+        self.solutions = solutions
+        self.timeout = timeout
+        self.dead = dead
+        self.lock = threading.Lock()
+        self.plan = None
+        self.optimal = False
+        self.failed = False
+        self.version = 0
+        self.cancel = threading.Event()
+
+    def update(self, game, move=None):
+        """Update the plan after the game changed
+
+        Args:
+            game (Game): Current game
+            move (list, optional): Move made by the player, None if unknown (new level or undo). Defaults to None.
+        """
+        with self.lock:
+            self.version += 1
+            # The result of the search in progress would be thrown away
+            self.cancel.set()
+            if move is not None and self.plan and self.optimal and tuple(self.plan[0]) == tuple(move):
+                self.plan = self.plan[1:]
+                return
+            self.plan = None
+            self.optimal = False
+            self.failed = False
+            version = self.version
+
+        self.cancel = threading.Event()
+        state = State.from_game(game)
+        if self.solutions is not None:
+            moves = self.solutions.solution(state)
+            if moves is not None:
+                self.set_plan(version, moves)
+                return
+        if self.dead is not None and state in self.dead:
+            self.set_plan(version, None)
+            return
+
+        thread = threading.Thread(target=self.replan, args=(version, state, self.cancel), daemon=True)
+        thread.start()
+
+    def replan(self, version, state, cancel):
+        """Search a new plan, runs in the worker thread
+
+        Args:
+            version (int): Version of the plan being searched
+            state (State): State to search from
+            cancel (Event): Set when this search is no longer needed
+        """
+        def interim(goal, bound):
+            if not cancel.is_set():
+                self.set_plan(version, path_moves(Graph().path(goal)), optimal=bound <= 1)
+
+        def search(node):
+            return portfolio(node, OPTIMAL_PORTFOLIO, self.timeout, cancel=cancel, dead=self.dead,
+                             on_solution=interim)
+
+        try:
+            if self.solutions is not None:
+                graph, goal = self.solutions.solve(Node(state), search)
+            else:
+                graph, goal = search(Node(state))
+            moves = path_moves(graph.path(goal)) if goal is not None else None
+            # Without a final plan, the last interim one may not be a shortest one
+            optimal = graph.bound is None or graph.bound <= 1
+        except Exception:
+            moves = None
+            optimal = False
+        if not cancel.is_set():
+            self.set_plan(version, moves, optimal)
+
+    def set_plan(self, version, moves, optimal=True):
+        """Set the plan, unless the game changed since it was requested
+
+        Args:
+            version (int): Version of the plan
+            moves (list): Moves of the plan, None if there is no solution
+            optimal (bool, optional): The plan is known to be a shortest one. Defaults to True.
+        """
+        with self.lock:
+            if version != self.version:
+                return
+            self.plan = moves
+            self.optimal = moves is not None and optimal
+            self.failed = moves is None
+
+    def hint(self):
+        """Get the next move of the plan
+
+        Returns:
+            tuple: Next move, None if the plan isn't ready or the game is solved
+        """
+        with self.lock:
+            if self.plan:
+                return self.plan[0]
+            return None
+
+    def stop(self):
+        """Stop the search in progress, if any
+        """
+        with self.lock:
+            self.version += 1
+        self.cancel.set()
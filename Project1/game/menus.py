@@ -98,6 +98,7 @@ class SettingsMenu:
         bfs = text_to_sprite("BFS", hint_img, (230, 230, 230), [800, 700], font2)
         dfs = text_to_sprite("DFS", hint_img, (230, 230, 230), [800, 700], font2)
         ids = text_to_sprite("IDS", hint_img, (230, 230, 230), [800, 700], font2)
+        ara = text_to_sprite("ARA*", hint_img, (230, 230, 230), [800, 700], font2)
 
         self.music = pygame.sprite.GroupSingle(music)
         self.sfx = pygame.sprite.GroupSingle(sfx)
@@ -113,6 +114,7 @@ class SettingsMenu:
         self.algorithms.append(pygame.sprite.GroupSingle(dfs))
         self.algorithms.append(pygame.sprite.GroupSingle(bfs))
         self.algorithms.append(pygame.sprite.GroupSingle(ids))
+        self.algorithms.append(pygame.sprite.GroupSingle(ara))
 
     def get_back(self):
         back = load_sprite("assets/img/buttons/back.png")
@@ -156,7 +158,7 @@ class SettingsMenu:
 
         if (self.algorithms[self.curr_hint].sprite.rect.collidepoint(mouse_pos)):
             self.curr_hint += 1
-            if (self.curr_hint >= 5):
+            if (self.curr_hint >= len(self.algorithms)):
                 self.curr_hint = 0
             return self.curr_hint + 3
         return -1
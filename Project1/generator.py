@@ -0,0 +1,258 @@
+import argparse
+import contextlib
+import io
+import json
+import random
+
+from graph import Node
+from solver import Algorithm, solve
+from tube import State
+
+
+def scramble(colors: int, capacity: int = 4, empty: int = 2, steps: int = None, rng: random.Random = None):
+    """Create a puzzle by undoing random moves from a solved state
+
+    Each step takes the ball on top of a tube that could have been the
+    last one poured into it, that is, alone or on a ball of the same
+    color, and puts it back on any other tube that isn't full. Every step
+    undoes a valid move, so the puzzle can always be solved in at most
+    that many moves.
+
+    Args:
+        colors (int): Number of colors
+        capacity (int, optional): Capacity of the tubes. Defaults to 4.
+        empty (int, optional): Number of empty tubes of the solved state. Defaults to 2.
+        steps (int, optional): Number of moves undone. Defaults to 3 times the number of balls.
+        rng (Random, optional): Random number generator. Defaults to a new one.
+
+    Returns:
+        State: Generated puzzle
+    """
+    if rng is None:
+        rng = random.Random()
+    if steps is None:
+        steps = 3 * colors * capacity
+
+    tubes = [[color] * capacity for color in range(1, colors + 1)] + [[] for _ in range(empty)]
+    last = None
+    for _ in range(steps):
+        sources = [i for i, balls in enumerate(tubes) if balls and (len(balls) == 1 or balls[-2] == balls[-1])]
+        targets = [i for i, balls in enumerate(tubes) if len(balls) < capacity]
+        moves = [(from_i, to_i) for from_i in sources for to_i in targets
+                 if from_i != to_i and (to_i, from_i) != last]
+        if not moves and last is not None:
+            moves = [(last[1], last[0])]
+        if not moves:
+            break
+        last = rng.choice(moves)
+        tubes[last[1]].append(tubes[last[0]].pop())
+
+    rng.shuffle(tubes)
+    return State(tuple(tuple(balls) for balls in tubes), capacity)
+
+
+def shuffle(colors: int, capacity: int = 4, empty: int = 2, rng: random.Random = None):
+    """Create a puzzle by shuffling all the balls into full tubes
+
+    Like the levels, the puzzles are harder than the scrambled ones, but
+    some of them can't be solved.
+
+    Args:
+        colors (int): Number of colors
+        capacity (int, optional): Capacity of the tubes. Defaults to 4.
+        empty (int, optional): Number of empty tubes. Defaults to 2.
+        rng (Random, optional): Random number generator. Defaults to a new one.
+
+    Returns:
+        State: Generated puzzle
+    """
+    if rng is None:
+        rng = random.Random()
+
+    balls = [color for color in range(1, colors + 1) for _ in range(capacity)]
+    rng.shuffle(balls)
+    tubes = [tuple(balls[i:i + capacity]) for i in range(0, len(balls), capacity)] + [()] * empty
+    return State(tuple(tubes), capacity)
+
+
+def solution_length(state: State, algorithm: Algorithm = Algorithm.IDA_STAR, max_depth: int = 200):
+    """Number of moves of the solution found by an algorithm
+
+    The solvers print a line when they find a goal, which is hidden here,
+    since it would be printed for every puzzle of the stream.
+
+    Args:
+        state (State): Puzzle
+        algorithm (Algorithm, optional): Algorithm, optimal by default. Defaults to Algorithm.IDA_STAR.
+        max_depth (int, optional): Max depth to search. Defaults to 200.
+
+    Returns:
+        int: Number of moves, None if no solution was found
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        graph, goal = solve(Node(state), algorithm, max_depth)
+    return len(graph.path(goal)) - 1 if goal is not None else None
+
+
+def generate(colors: int, capacity: int = 4, empty: int = 2, steps: int = None, rng: random.Random = None,
+             length: tuple = None, method: str = 'scramble', algorithm: Algorithm = Algorithm.IDA_STAR,
+             attempts: int = 100):
+    """Create a solvable puzzle, optionally with a solution length in a range
+
+    Scrambled puzzles are always solvable and are only solved to check
+    their length. Shuffled puzzles are always solved, and the ones without
+    a solution are skipped.
+
+    Args:
+        colors (int): Number of colors
+        capacity (int, optional): Capacity of the tubes. Defaults to 4.
+        empty (int, optional): Number of empty tubes. Defaults to 2.
+        steps (int, optional): Number of moves undone by scramble. Defaults to 3 times the number of balls.
+        rng (Random, optional): Random number generator. Defaults to a new one.
+        length (tuple, optional): Minimum and maximum length of the solution. Defaults to None.
+        method (str, optional): 'scramble' (fast, easier puzzles) or 'shuffle' (harder, each one is
+            solved). Defaults to 'scramble'.
+        algorithm (Algorithm, optional): Algorithm that measures the length. Defaults to Algorithm.IDA_STAR.
+        attempts (int, optional): Puzzles tried before giving up. Defaults to 100.
+
+    Returns:
+        State: Generated puzzle, None if none was solvable with the length
+    """
+    if rng is None:
+        rng = random.Random()
+
+    for _ in range(attempts):
+        if method == 'scramble':
+            state = scramble(colors, capacity, empty, steps, rng)
+        else:
+            state = shuffle(colors, capacity, empty, rng)
+        if state.finished():
+            continue
+        if length is None and method == 'scramble':
+            return state
+        moves = solution_length(state, algorithm)
+        if moves is not None and (length is None or length[0] <= moves <= length[1]):
+            return state
+    return None
+
+
+def puzzles(count: int, colors: int, capacity: int = 4, empty: int = 2, steps: int = None, seed: int = None,
+            length: tuple = None, method: str = 'scramble', relabel_colors: bool = False):
+    """Generate different puzzles
+
+    The puzzles are compared by their canonical key, so two puzzles that
+    only differ in the order of the tubes (and of the colors, with
+    relabel_colors) aren't both generated. It stops early when there
+    seem to be no new puzzles left.
+
+    Args:
+        count (int): Number of puzzles
+        colors (int): Number of colors
+        capacity (int, optional): Capacity of the tubes. Defaults to 4.
+        empty (int, optional): Number of empty tubes. Defaults to 2.
+        steps (int, optional): Number of moves undone. Defaults to 3 times the number of balls.
+        seed (int, optional): Seed, for the same puzzles every time. Defaults to None.
+        length (tuple, optional): Minimum and maximum length of the optimal solution. Defaults to None.
+        method (str, optional): 'scramble' or 'shuffle', see generate. Defaults to 'scramble'.
+        relabel_colors (bool, optional): Also ignore which color is which. Defaults to False.
+
+    Yields:
+        State: Generated puzzle
+    """
+    rng = random.Random(seed)
+    seen = set()
+    generated = 0
+    duplicates = 0
+    while generated < count and duplicates < 1000:
+        state = generate(colors, capacity, empty, steps, rng, length, method)
+        if state is None:
+            return
+        key = state.canonical_key(relabel_colors)
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        duplicates = 0
+        generated += 1
+        yield state
+
+
+def write_puzzles(path: str, states, num_tubes: int, capacity: int = 4):
+    """Write puzzles to a compact file
+
+    The file has a JSON header line followed by a record of
+    num_tubes * capacity bytes for each puzzle, with the balls of each
+    tube from the bottom and 0 for the empty places.
+
+    Args:
+        path (str): Puzzles file
+        states (iterable): Puzzles to write
+        num_tubes (int): Number of tubes of the puzzles
+        capacity (int, optional): Capacity of the tubes. Defaults to 4.
+
+    Returns:
+        int: Number of puzzles written
+    """
+    count = 0
+    with open(path, 'wb') as f:
+        f.write((json.dumps({'tubes': num_tubes, 'capacity': capacity}) + '\n').encode())
+        for state in states:
+            record = bytearray(num_tubes * capacity)
+            for i, balls in enumerate(state.tubes):
+                record[i * capacity:i * capacity + len(balls)] = bytes(balls)
+            f.write(record)
+            count += 1
+    return count
+
+
+def read_puzzles(path: str):
+    """Read the puzzles of a file written by write_puzzles
+
+    Args:
+        path (str): Puzzles file
+
+    Yields:
+        State: Puzzle
+    """
+    with open(path, 'rb') as f:
+        header = json.loads(f.readline())
+        num_tubes, capacity = header['tubes'], header['capacity']
+        size = num_tubes * capacity
+        while True:
+            record = f.read(size)
+            if len(record) < size:
+                return
+            tubes = tuple(tuple(ball for ball in record[i:i + capacity] if ball)
+                          for i in range(0, size, capacity))
+            yield State(tubes, capacity)
+
+
+def parse_args():
+    """Parse the command line arguments
+
+    Returns:
+        Namespace: Arguments
+    """
+    parser = argparse.ArgumentParser(description='Generate solvable puzzles')
+    parser.add_argument('--count', type=int, default=1000, help='number of puzzles')
+    parser.add_argument('--colors', type=int, default=7, help='number of colors')
+    parser.add_argument('--capacity', type=int, default=4, help='capacity of the tubes')
+    parser.add_argument('--empty', type=int, default=2, help='number of empty tubes')
+    parser.add_argument('--steps', type=int, default=None, help='moves undone from the solved state')
+    parser.add_argument('--length', type=int, nargs=2, default=None, metavar=('MIN', 'MAX'),
+                        help='length of the optimal solution, checked with IDA*')
+    parser.add_argument('--method', choices=['scramble', 'shuffle'], default='scramble',
+                        help='undo random moves (fast) or shuffle and solve (harder puzzles)')
+    parser.add_argument('--relabel', action='store_true', help='also skip puzzles that only differ in the colors')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the puzzles')
+    parser.add_argument('--output', default='puzzles.bin', help='puzzles file')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    states = puzzles(args.count, args.colors, args.capacity, args.empty, args.steps, args.seed,
+                     args.length, args.method, args.relabel)
+    count = write_puzzles(args.output, states, args.colors + args.empty, args.capacity)
+    print('{} puzzles written to {}'.format(count, args.output))
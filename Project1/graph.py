@@ -1,21 +1,38 @@
 import copy
-from tube import Tube, Game
+import functools
+from tube import Tube, Game, State
 
 class Node:
     parent = None
+    move = None
+    balls_moved = 1
+    _key = None
+    _heuristics = None
 
-    def __init__(self, gamestate: Game, cost: int = 0, dist: int = 0):
+    def __init__(self, gamestate, cost: int = 0, dist: int = 0):
         """Initializes Node
 
+        The gamestate is kept as a compact State. A Game is converted,
+        so later changes to it don't affect the node.
+
         Args:
-            gamestate (Game): Current Gamestate
+            gamestate (Game | State): Current Gamestate
             cost (int, optional): Cost estimate to the solution. Defaults to 0.
             dist (int, optional): Distance from the initial state. Defaults to 0.
         """
-        self.gamestate = gamestate
+        self.state = gamestate if isinstance(gamestate, State) else State.from_game(gamestate)
         self.dist = dist
         self.cost = cost
 
+    @property
+    def gamestate(self):
+        """Gamestate of the node as a Game
+
+        Returns:
+            Game: New Game built from the node's state
+        """
+        return self.state.to_game()
+
     def __eq__(self, o):
         """Check if two nodes are equal
 
@@ -25,21 +42,36 @@ class Node:
         Returns:
             boolean: True if both nodes are equal, False otherwise
         """
-        return self.gamestate.__eq__(o.gamestate)
+        return self.key() == o.key()
 
     def __hash__(self):
         """Hash Function
 
         Returns:
-            String: Hash for the current Node
+            int: Hash for the current Node
         """
-        return ".".join([str(tube) for tube in self.gamestate.get_tubes()])
+        return hash(self.key())
+
+    def key(self):
+        """Integer key of the node's gamestate
+
+        The key is the canonical key of the state, so nodes whose
+        gamestates only differ in the order of the tubes have the same key.
+        It is computed once, since the gamestate of a node isn't
+        changed after the node is created.
+
+        Returns:
+            int: Canonical key of the gamestate
+        """
+        if self._key is None:
+            self._key = self.state.canonical_key()
+        return self._key
 
     def print(self):
         """Print node gamestate
         """
-        self.gamestate.print()
-        print("-----" * len(self.gamestate.tubes))
+        self.state.print()
+        print("-----" * len(self.state.tubes))
 
     def __lt__(self, o):
         """Compares two nodes
@@ -92,6 +124,46 @@ class Node:
         """
         return copy.deepcopy(self)
 
+    def heuristics(self):
+        """Totals of the per-tube contributions to the heuristics
+
+        The totals are computed once, from the cached contributions of
+        each tube, unless they were already set by update_heuristics.
+
+        Returns:
+            tuple: Number of wrong balls and node score
+        """
+        if self._heuristics is None:
+            wrong = 0
+            score = 0
+            for balls in self.state.tubes:
+                tube_wrong, tube_score, _ = tube_heuristics(balls)
+                wrong += tube_wrong
+                score += tube_score
+            self._heuristics = (wrong, score)
+        return self._heuristics
+
+    def update_heuristics(self, parent, from_i: int, to_i: int):
+        """Set the heuristics totals from the parent's, after a move
+
+        A move only changes two tubes, so the contributions of those tubes
+        in the parent are replaced by the new ones, without scanning the
+        other tubes.
+
+        Args:
+            parent (Node): Node where the move was made
+            from_i (int): Index of the tube the ball was removed from
+            to_i (int): Index of the tube the ball was put in
+        """
+        wrong, score = parent.heuristics()
+        for old_balls, new_balls in ((parent.state.tubes[from_i], self.state.tubes[from_i]),
+                                     (parent.state.tubes[to_i], self.state.tubes[to_i])):
+            old_wrong, old_score, _ = tube_heuristics(old_balls)
+            new_wrong, new_score, _ = tube_heuristics(new_balls)
+            wrong += new_wrong - old_wrong
+            score += new_score - old_score
+        self._heuristics = (wrong, score)
+
     def number_of_wrong_heuristics(self):
         """Number of wrong balls in a node heuristics
 
@@ -102,33 +174,37 @@ class Node:
         Returns:
             int: Estimate cost to get to the solution
         """
-        cost = 0
+        return self.heuristics()[0]
 
-        for tube in self.gamestate.tubes:
-            balls = tube.balls.copy()
+    def number_of_wrong_runs_heuristics(self):
+        """Number of wrong runs in a node heuristics
 
-            if len(balls) == 0: continue
+        The wrong balls of a tube, see tube_heuristics, are split in runs
+        of the same color. A pour moves balls of a single run that weren't
+        moved yet, since runs of a tube are separated by another color, so
+        at least one pour per run is needed. Unlike the wrong balls, it
+        doesn't overestimate the pours.
 
-            idx = next((i for i, v in enumerate(balls) if v != balls[0]), -1)
-            if idx == -1: continue
-
-            balls = balls[idx:]
-            cost += len(balls)
-
-        return cost
+        Returns:
+            int: Estimate cost to get to the solution, in pours
+        """
+        return sum(wrong_runs(balls) for balls in self.state.tubes)
 
     def number_of_consecutive_heuristics(self):
         """Number of consecutive heuristics
 
         This heuristics calculates the maximum number of consecutive
         balls of the same color for each color and estimates the cost
-        by calculating how many are needed to have the 4 balls of the
-        same color in the same tube.
+        by calculating how many are needed to have all the balls of the
+        same color in the same tube, as many as the capacity.
 
         For example, if there is a blue ball in tube 1 and another in
         tube 2, and there are 2 blue balls in tube 3, since the maximum
         number of consecutive balls is 2, it will be needed at least
-        4-2 moves to put all the balls in the same tue.
+        4-2 moves to put all the balls in the same tube, with capacity 4.
+
+        The maximum of each tube is cached, so only the maximum
+        of every color is calculated here.
 
         Returns:
             int: Estimate cost to get to the solution
@@ -136,20 +212,15 @@ class Node:
         cost = 0
         dic = dict()
 
-        for tube in self.gamestate.tubes:
-            balls = tube.balls
-            if (len(balls) == 0): continue
+        for balls in self.state.tubes:
+            _, _, consecutive = tube_heuristics(balls)
+            if consecutive is None: continue
 
-            for i in range(0, len(balls)):
-                idx = next((x for x, v in enumerate(balls, start=i) if v != balls[i]), -1)
-                if idx == -1:
-                    dic.setdefault(balls[0], []).append(len(balls) - i)
-                    break
-                else:
-                    dic.setdefault(balls[0], []).append(idx - i)
+            color, count = consecutive
+            dic[color] = max(dic.get(color, 0), count)
 
         for key in dic:
-            cost += 4 - max(dic[key])
+            cost += self.state.capacity - dic[key]
 
         return cost
 
@@ -166,89 +237,218 @@ class Node:
         Returns:
             int: Node score, the higher the better
         """
-        score = 0
+        return self.heuristics()[1]
+
+
+def split_move(node: Node):
+    """Nodes between a node's parent and the node when its balls are moved one at a time
+
+    Args:
+        node (Node): Node created by a move of more than one ball
+
+    Returns:
+        list: Intermediate nodes, from the parent's side, without the parent and the node
+    """
+    from_i, to_i = node.move
+    steps = []
+    parent = node.parent
+    for _ in range(node.balls_moved - 1):
+        step = Node(parent.state.apply_move(from_i, to_i), 0, parent.dist)
+        step.set_parent(parent)
+        step.move = node.move
+        steps.append(step)
+        parent = step
+    return steps
+
 
-        for tube in self.gamestate.tubes:
-            balls = tube.balls.copy()
+@functools.lru_cache(maxsize=65536)
+def tube_heuristics(balls: tuple):
+    """Contributions of a tube to the heuristics
 
-            if len(balls) == 0:
-                score += 10
-            else:
-                c1 = balls.pop(0)
-                cnt = 1
-                while len(balls) != 0:
-                    c2 = balls.pop(0)
-                    if c1 == c2:
-                        cnt += 1
-                    else:
-                        c1 = c2
-                        cnt = 1
-                score += (5 * cnt)
+    The tubes are shared between states, so the contributions of each
+    tube are only calculated once:
+        - Wrong balls: balls above the first one of a different color than the bottom one
+        - Score: 10 if the tube is empty, else 5 per ball of the top sequence of the same color
+        - Consecutive: bottom color and the longest sequence found, None if the tube is empty
 
-        return score
+    Args:
+        balls (tuple): Balls of the tube
+
+    Returns:
+        tuple: Wrong balls, score and consecutive contributions
+    """
+    if len(balls) == 0:
+        return 0, 10, None
+
+    idx = next((i for i, v in enumerate(balls) if v != balls[0]), -1)
+    wrong = 0 if idx == -1 else len(balls) - idx
+
+    cnt = 1
+    for i in range(1, len(balls)):
+        cnt = cnt + 1 if balls[i] == balls[i - 1] else 1
+    score = 5 * cnt
+
+    counts = []
+    for i in range(0, len(balls)):
+        idx = next((x for x, v in enumerate(balls, start=i) if v != balls[i]), -1)
+        if idx == -1:
+            counts.append(len(balls) - i)
+            break
+        else:
+            counts.append(idx - i)
+
+    return wrong, score, (balls[0], max(counts))
+
+
+@functools.lru_cache(maxsize=65536)
+def wrong_runs(balls: tuple):
+    """Number of runs of the same color among the wrong balls of a tube
+
+    Args:
+        balls (tuple): Balls of the tube
+
+    Returns:
+        int: Number of wrong runs
+    """
+    idx = next((i for i, v in enumerate(balls) if v != balls[0]), len(balls))
+    return sum(1 for i in range(idx, len(balls)) if i == idx or balls[i] != balls[i - 1])
 
 
 class Graph:
 
-    def __init__(self, depth=None, visited=None):
+    def __init__(self, depth=None, visited=None, keep_nodes: bool = True):
         """Initializes Graph
 
+        A lean graph (keep_nodes False) only counts the visited nodes of
+        each depth and keeps the dist of each visited gamestate, so the
+        nodes are freed as soon as they aren't in the frontier or in the
+        path of a node that is. The solution path is still available
+        through the parent links.
+
         Args:
             depth (List, optional): Visited nodes organized by depth. Defaults to None.
-            visited (List, optional): Visited nodes. Defaults to None.
+            visited (dict, optional): Visited nodes indexed by their key. Defaults to None.
+            keep_nodes (bool, optional): Keep the visited nodes, e.g. to show the explored graph. Defaults to True.
         """
         self.depth = [] if depth is None else depth
-        self.visited = [] if visited is None else visited
+        self.visited = {} if visited is None else visited
+        self.keep_nodes = keep_nodes
+        self.counts = []
+        self.pruned = {}
+        self.discarded = 0
+        self.iterations = []
+        self.generated = 0
+        self.max_frontier = 0
+        self.stats = None
+        self.solutions = []
+        # Bound of the solution's length over the optimal one, None if the search doesn't give one
+        self.bound = None
 
     def new_depth(self):
         """Add a new depth to the depth list
         """
-        self.depth.append([])
+        if self.keep_nodes:
+            self.depth.append([])
+        else:
+            self.counts.append(0)
 
     def add_node(self, node: Node, level):
-        """Add a node to the depths list
+        """Add a node to the depths list, or only count it in a lean graph
 
         Args:
             node (Node): Visited node
             level (int): Node's depth
         """
-        while len(self.depth) < level:
+        while len(self.depth) + len(self.counts) < level:
             self.new_depth()
 
-        self.depth[level - 1].append(node)
+        if self.keep_nodes:
+            self.depth[level - 1].append(node)
+        else:
+            self.counts[level - 1] += 1
 
     def visit(self, node: Node):
-        """Add Node to visited
+        """Add Node to visited, only its dist in a lean graph
 
         Args:
             node (Node): Visited Node
         """
-        self.visited.append(node)
+        self.visited[node.key()] = node if self.keep_nodes else node.dist
+
+    def get_visited(self, node: Node):
+        """Get the visited node with the same gamestate
+
+        Args:
+            node (Node): Node to look for
+
+        Returns:
+            Node: Visited node, if found and the nodes are kept, None otherwise
+        """
+        if not self.keep_nodes:
+            return None
+        return self.visited.get(node.key())
+
+    def visited_dist(self, node: Node):
+        """Get the dist of the visited node with the same gamestate
+
+        Args:
+            node (Node): Node to look for
+
+        Returns:
+            int: Dist of the visited node, if found, None otherwise
+        """
+        visited = self.visited.get(node.key())
+        if visited is None or not self.keep_nodes:
+            return visited
+        return visited.dist
 
-    def path(self, dest):
+    def path(self, dest, single_steps: bool = True):
         """Get a path from the starting node to the destination node
 
         Args:
             dest (Node): Final node
+            single_steps (bool, optional): Split the moves of more than one ball into
+                single ball moves. Defaults to True.
 
         Returns:
             List: Path from the initial node
         """
         node = dest
         path = [dest]
-        while node != self.depth[0][0]:
+        while node.parent is not None:
+            if single_steps and node.balls_moved > 1:
+                path += reversed(split_move(node))
             path.append(node.parent)
             node = node.parent
         path.reverse()
         return path
 
+    def discard(self, count: int = 1):
+        """Count expanded states that aren't kept in the graph
+
+        Args:
+            count (int, optional): Number of expanded states. Defaults to 1.
+        """
+        self.discarded += count
+
+    def generate(self, count: int, frontier: int):
+        """Count generated states and the size of the frontier
+
+        Args:
+            count (int): Number of states generated by an expansion
+            frontier (int): Number of states waiting to be expanded
+        """
+        self.generated += count
+        if frontier > self.max_frontier:
+            self.max_frontier = frontier
+
     def expanded_states(self):
         """Get number of expanded states
 
         Returns:
             int: Number of expanded states
         """
-        count = 0
+        count = self.discarded + sum(self.counts)
         for level in self.depth:
             count += len(level)
         return count
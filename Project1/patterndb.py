@@ -0,0 +1,361 @@
+import argparse
+import functools
+import json
+import os
+from collections import deque
+
+import numpy as np
+
+# Distance stored for the states that can't reach the goal
+UNREACHABLE = 255
+
+
+class PatternDB:
+    def __init__(self, keys, dists, tubes: int, capacity: int, colors: int, additive: bool = True) -> None:
+        """Initializes PatternDB, a pattern database heuristic
+
+        The abstraction tracks the balls of a single color and treats the
+        others as blanks, which may be put on top of each other. Since all
+        colors have the same number of balls, the same table gives the
+        distance of every color. In an additive database only the moves of
+        the tracked color are counted, so the distances of all the colors
+        can be added; otherwise every move is counted and the heuristics is
+        the maximum of the colors. Both are admissible.
+
+        A table only has the states of a number of tubes, capacity and
+        colors, so the heuristics of any other state is an error.
+
+        Args:
+            keys (ndarray): Sorted keys of the abstract states, as uint64
+            dists (ndarray): Distance to the goal of each abstract state, as uint8
+            tubes (int): Number of tubes of the table
+            capacity (int): Capacity of the tubes
+            colors (int): Number of colors of the table
+            additive (bool, optional): Only the moves of the tracked color were counted. Defaults to True.
+        """
+        self.keys = keys
+        self.dists = dists
+        self.tubes = tubes
+        self.capacity = capacity
+        self.colors = colors
+        self.additive = additive
+        self.lookup = functools.lru_cache(maxsize=1 << 18)(self.lookup)
+
+    @classmethod
+    def load(cls, directory: str, tubes: int, capacity: int, colors: int, additive: bool = True):
+        """Load a pattern database built by build, memory-mapped from disk
+
+        Args:
+            directory (str): Directory of the tables
+            tubes (int): Number of tubes
+            capacity (int): Capacity of the tubes
+            colors (int): Number of colors
+            additive (bool, optional): Load the additive table. Defaults to True.
+
+        Returns:
+            PatternDB: Pattern database
+
+        Raises:
+            ValueError: If the table saved in the file was built for another configuration
+        """
+        path = table_path(directory, tubes, capacity, colors, additive)
+        config = {'tubes': tubes, 'capacity': capacity, 'colors': colors, 'additive': additive}
+        if os.path.exists(path + '.json'):
+            with open(path + '.json') as f:
+                saved = json.load(f)
+            if saved != config:
+                raise ValueError('The table {} was built for {}, not {}'.format(path, saved, config))
+        keys = np.load(path + '.keys.npy', mmap_mode='r')
+        dists = np.load(path + '.dists.npy', mmap_mode='r')
+        return cls(keys, dists, tubes, capacity, colors, additive)
+
+    def lookup(self, key: int):
+        """Get the distance of an abstract state
+
+        Args:
+            key (int): Key of the abstract state
+
+        Returns:
+            int: Distance to the goal, UNREACHABLE if the state isn't in the table
+        """
+        i = int(np.searchsorted(self.keys, key))
+        if i < len(self.keys) and int(self.keys[i]) == key:
+            return int(self.dists[i])
+        return UNREACHABLE
+
+    def heuristic(self, state):
+        """Admissible estimate of the number of moves to solve a state
+
+        Args:
+            state (State): State
+
+        Returns:
+            int: Estimate of the moves to the goal
+
+        Raises:
+            ValueError: If the state doesn't have the tubes, capacity and colors of the table
+        """
+        colors = {ball for balls in state.tubes for ball in balls}
+        if len(state.tubes) != self.tubes or state.capacity != self.capacity or len(colors) != self.colors:
+            raise ValueError('A table of {} tubes of capacity {} with {} colors can\'t estimate a state of '
+                             '{} tubes of capacity {} with {} colors'.format(self.tubes, self.capacity, self.colors,
+                                                                             len(state.tubes), state.capacity,
+                                                                             len(colors)))
+        dists = [self.lookup(abstract_key(state.tubes, color, self.capacity)) for color in colors]
+        if self.additive:
+            return sum(dists)
+        return max(dists, default=0)
+
+
+def tube_code(balls: tuple, color: int):
+    """Code of a tube in the abstraction of a color
+
+    The code is a 1 bit above the balls, followed by a bit for each ball,
+    1 for the tracked color, with the bottom ball in the lowest bit.
+
+    Args:
+        balls (tuple): Balls of the tube
+        color (int): Tracked color
+
+    Returns:
+        int: Code of the tube
+    """
+    code = 1 << len(balls)
+    for i, ball in enumerate(balls):
+        if ball == color:
+            code |= 1 << i
+    return code
+
+
+def pack_codes(codes, capacity: int):
+    """Key of an abstract state, its sorted tube codes packed in an integer
+
+    Args:
+        codes (iterable): Code of each tube
+        capacity (int): Capacity of the tubes
+
+    Returns:
+        int: Key of the abstract state
+    """
+    key = 0
+    for code in sorted(codes):
+        key = (key << (capacity + 1)) | code
+    return key
+
+
+def abstract_key(tubes, color: int, capacity: int):
+    """Key of a state in the abstraction of a color
+
+    Args:
+        tubes (tuple): Balls of each tube
+        color (int): Tracked color
+        capacity (int): Capacity of the tubes
+
+    Returns:
+        int: Key of the abstract state
+    """
+    return pack_codes((tube_code(balls, color) for balls in tubes), capacity)
+
+
+def unpack_codes(key: int, tubes: int, capacity: int):
+    """Tube codes of an abstract state
+
+    Args:
+        key (int): Key of the abstract state
+        tubes (int): Number of tubes
+        capacity (int): Capacity of the tubes
+
+    Returns:
+        list: Code of each tube, sorted
+    """
+    mask = (1 << (capacity + 1)) - 1
+    codes = []
+    for _ in range(tubes):
+        codes.append(key & mask)
+        key >>= capacity + 1
+    codes.reverse()
+    return codes
+
+
+def goal_keys(tubes: int, capacity: int, colors: int):
+    """Keys of the abstract goal states
+
+    The tracked color fills a tube and the blanks are anywhere in the
+    other tubes.
+
+    Args:
+        tubes (int): Number of tubes
+        capacity (int): Capacity of the tubes
+        colors (int): Number of colors
+
+    Returns:
+        list: Keys of the goal states
+    """
+    full = (1 << capacity) | ((1 << capacity) - 1)
+    keys = []
+
+    def fill(heights, remaining):
+        if len(heights) == tubes - 1:
+            if remaining == 0:
+                keys.append(pack_codes([full] + [1 << height for height in heights], capacity))
+            return
+        last = heights[-1] if heights else capacity
+        for height in range(min(last, remaining), -1, -1):
+            fill(heights + [height], remaining - height)
+
+    fill([], (colors - 1) * capacity)
+    return keys
+
+
+def predecessors(codes: list, capacity: int, additive: bool):
+    """Abstract states that reach the given one with a single move
+
+    Args:
+        codes (list): Code of each tube
+        capacity (int): Capacity of the tubes
+        additive (bool): Only the moves of the tracked color cost 1
+
+    Returns:
+        list: Codes of each previous state with the cost of the move
+    """
+    states = []
+    for to_i, to_code in enumerate(codes):
+        height = to_code.bit_length() - 1
+        if height == 0:
+            continue
+        ball = (to_code >> (height - 1)) & 1
+        rest = (to_code & ((1 << (height - 1)) - 1)) | (1 << (height - 1))
+        if height > 1 and (rest >> (height - 2)) & 1 != ball:
+            continue
+        cost = ball if additive else 1
+        for from_i, from_code in enumerate(codes):
+            from_height = from_code.bit_length() - 1
+            if from_i == to_i or from_height == capacity:
+                continue
+            parent = list(codes)
+            parent[to_i] = rest
+            parent[from_i] = (from_code ^ (1 << from_height)) | (ball << from_height) | (1 << (from_height + 1))
+            states.append((parent, cost))
+    return states
+
+
+def build(tubes: int, capacity: int, colors: int, additive: bool = True):
+    """Compute the distance to the goal of every abstract state
+
+    A backward breadth-first search from the goal states. When only the
+    moves of the tracked color are counted, the moves of the blanks cost 0
+    and are put at the front of the queue (0-1 BFS).
+
+    Args:
+        tubes (int): Number of tubes
+        capacity (int): Capacity of the tubes
+        colors (int): Number of colors
+        additive (bool, optional): Only count the moves of the tracked color. Defaults to True.
+
+    Returns:
+        tuple: Sorted keys and their distances, as numpy arrays
+    """
+    if tubes * (capacity + 1) > 64:
+        raise ValueError('The keys of {} tubes of capacity {} don\'t fit in 64 bits'.format(tubes, capacity))
+
+    dists = {}
+    queue = deque()
+    for key in goal_keys(tubes, capacity, colors):
+        dists[key] = 0
+        queue.append((key, 0))
+
+    while queue:
+        key, dist = queue.popleft()
+        if dists[key] < dist:
+            continue
+        for parent, cost in predecessors(unpack_codes(key, tubes, capacity), capacity, additive):
+            parent_key = pack_codes(parent, capacity)
+            new_dist = min(dist + cost, UNREACHABLE - 1)
+            if new_dist < dists.get(parent_key, UNREACHABLE):
+                dists[parent_key] = new_dist
+                if cost == 0:
+                    queue.appendleft((parent_key, new_dist))
+                else:
+                    queue.append((parent_key, new_dist))
+
+    keys = np.fromiter(dists.keys(), dtype=np.uint64, count=len(dists))
+    values = np.fromiter(dists.values(), dtype=np.uint8, count=len(dists))
+    order = np.argsort(keys)
+    return keys[order], values[order]
+
+
+def table_path(directory: str, tubes: int, capacity: int, colors: int, additive: bool = True):
+    """Path of a table, without the extension
+
+    Args:
+        directory (str): Directory of the tables
+        tubes (int): Number of tubes
+        capacity (int): Capacity of the tubes
+        colors (int): Number of colors
+        additive (bool, optional): Additive table. Defaults to True.
+
+    Returns:
+        str: Path of the table
+    """
+    name = 'pdb-{}-{}-{}-{}'.format(tubes, capacity, colors, 'add' if additive else 'max')
+    return os.path.join(directory, name)
+
+
+def save(directory: str, tubes: int, capacity: int, colors: int, additive: bool = True):
+    """Build a table and save it with its configuration, to be loaded with PatternDB.load
+
+    Args:
+        directory (str): Directory of the tables
+        tubes (int): Number of tubes
+        capacity (int): Capacity of the tubes
+        colors (int): Number of colors
+        additive (bool, optional): Only count the moves of the tracked color. Defaults to True.
+
+    Returns:
+        int: Number of abstract states
+    """
+    keys, dists = build(tubes, capacity, colors, additive)
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(directory, tubes, capacity, colors, additive)
+    np.save(path + '.keys.npy', keys)
+    np.save(path + '.dists.npy', dists)
+    with open(path + '.json', 'w') as f:
+        json.dump({'tubes': tubes, 'capacity': capacity, 'colors': colors, 'additive': additive}, f)
+    return len(keys)
+
+
+def parse_args():
+    """Parse the command line arguments
+
+    Returns:
+        Namespace: Arguments
+    """
+    parser = argparse.ArgumentParser(description='Build the pattern databases of the heuristics')
+    parser.add_argument('--levels', default=None, help='build the tables of every level in this file')
+    parser.add_argument('--tubes', type=int, default=None, help='number of tubes')
+    parser.add_argument('--capacity', type=int, default=4, help='capacity of the tubes, with --tubes')
+    parser.add_argument('--colors', type=int, default=None, help='number of colors')
+    parser.add_argument('--max', action='store_true', help='build the max table instead of the additive one')
+    parser.add_argument('--dir', default='pdb', help='directory of the tables')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    configs = set()
+    if args.levels is not None:
+        with open(args.levels) as f:
+            levels = json.load(f)
+        for level in levels.values():
+            tubes = level['tubes']
+            balls = [ball for balls in tubes for ball in balls]
+            # Every color has a ball for each place of a tube
+            capacity = balls.count(balls[0]) if balls else args.capacity
+            configs.add((len(tubes), capacity, len(set(balls))))
+    if args.tubes is not None and args.colors is not None:
+        configs.add((args.tubes, args.capacity, args.colors))
+
+    for tubes, capacity, colors in sorted(configs):
+        count = save(args.dir, tubes, capacity, colors, not args.max)
+        print('{} tubes, capacity {}, {} colors: {} states'.format(tubes, capacity, colors, count))
@@ -0,0 +1,159 @@
+import multiprocessing
+import queue
+import time
+
+from deadstates import DeadStates
+from graph import Graph, Node
+from solver import Algorithm, DEAD_ENDS, solve, path_moves, path_to_node
+from tube import State
+
+# Algorithms run by default, with their max depth
+DEFAULT_PORTFOLIO = [
+    (Algorithm.A_STAR, 30),
+    (Algorithm.GREEDY, 30),
+    (Algorithm.DFS, 60),
+    (Algorithm.IDA_STAR, 60),
+]
+
+# Algorithms whose solutions are optimal, so the first one found is the best. ARA* also
+# sends the better and better solutions it finds on the way
+OPTIMAL_PORTFOLIO = [
+    (Algorithm.A_STAR, 60),
+    (Algorithm.IDA_STAR, 60),
+    (Algorithm.ARA_STAR, 60),
+]
+
+# Algorithms that find a first solution fast and keep improving it
+ANYTIME = [Algorithm.ARA_STAR]
+
+# Other arguments of the algorithms. The iterative deepening searches only keep their path by
+# default, which is too slow for the game, so they keep a transposition table here
+ALGORITHM_PARAMS = {
+    Algorithm.IDS: {'transposition': True},
+    Algorithm.IDA_STAR: {'transposition': True},
+}
+
+
+def run_algorithm(algorithm: Algorithm, max_depth: int, tubes: tuple, capacity: int, results,
+                  dead_keys: list = None):
+    """Worker process of the portfolio, runs a single algorithm
+
+    Only the tubes and the moves of the solution are sent between the
+    processes, since they are much smaller than the nodes. The portfolio
+    has its own time limit, so an anytime algorithm searches until its
+    solution is proven optimal, and sends each better solution on the way.
+
+    Args:
+        algorithm (Algorithm): Algorithm to run
+        max_depth (int): Max depth to search
+        tubes (tuple): Balls of each tube of the start state
+        capacity (int): Capacity of the tubes
+        results (Queue): Queue where the result is put, as (algorithm, moves, bound, expanded states,
+            dead keys). The better solutions sent before it have no expanded states.
+        dead_keys (list, optional): Keys of the known dead states, used by the algorithms that
+            support them, which send back the keys they know at the end. Defaults to None.
+    """
+    params = dict(ALGORITHM_PARAMS.get(algorithm, {}))
+    if algorithm in ANYTIME:
+        def improved(goal, bound):
+            results.put((algorithm, path_moves(Graph().path(goal)), bound, None, None))
+
+        params['timeout'] = float('inf')
+        params['on_solution'] = improved
+    if dead_keys is not None and algorithm in DEAD_ENDS:
+        params['dead'] = DeadStates()
+        params['dead'].update(dead_keys)
+    try:
+        graph, goal = solve(Node(State(tubes, capacity)), algorithm, max_depth, **params)
+        moves = path_moves(graph.path(goal)) if goal is not None else None
+        keys = params['dead'].keys() if 'dead' in params else None
+        results.put((algorithm, moves, None, graph.expanded_states(), keys))
+    except Exception:
+        results.put((algorithm, None, None, 0, None))
+
+
+def portfolio(start_node: Node, algorithms: list = None, timeout: float = 20, wait_best: bool = False,
+              cancel=None, dead: DeadStates = None, on_solution=None):
+    """Run several algorithms at the same time, each in its own process
+
+    By default the first solution found is returned. With wait_best, the
+    algorithms run until all of them finish or the time runs out, and the
+    shortest solution is returned. In both cases, the processes still
+    running at the end are terminated. If no algorithm finished with a
+    solution, the shortest one sent by an anytime algorithm is returned,
+    with its bound in graph.bound.
+
+    Args:
+        start_node (Node): Start node
+        algorithms (list, optional): Algorithms to run, with their max depth. Defaults to DEFAULT_PORTFOLIO.
+        timeout (float, optional): Maximum time, in seconds. Defaults to 20.
+        wait_best (bool, optional): Wait for every algorithm and return the shortest solution. Defaults to False.
+        cancel (Event, optional): Stop waiting and terminate the processes when set. Defaults to None.
+        dead (DeadStates, optional): Cache of dead states shared with the algorithms, the states they
+            prove dead are added to it. It also stops the search if the start state is dead. Defaults to None.
+        on_solution (function, optional): Function called with each better solution node sent by an anytime
+            algorithm before its result, and the bound of its length over the optimal one. Defaults to None.
+
+    Returns:
+        tuple: Graph with the solution node, if found
+    """
+    if algorithms is None:
+        algorithms = DEFAULT_PORTFOLIO
+
+    results = multiprocessing.Queue()
+    dead_keys = dead.keys() if dead is not None else None
+    processes = []
+    for algorithm, max_depth in algorithms:
+        process = multiprocessing.Process(target=run_algorithm, daemon=True,
+                                          args=(algorithm, max_depth, start_node.state.tubes,
+                                                start_node.state.capacity, results, dead_keys))
+        process.start()
+        processes.append(process)
+
+    best = None
+    # Shortest solution of an anytime algorithm, with its bound
+    interim = None
+    graph = Graph()
+    start = time.perf_counter()
+    deadline = start + timeout
+    received = 0
+    try:
+        while received < len(processes):
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                break
+            try:
+                algorithm, moves, bound, expanded, keys = results.get(timeout=min(remaining, 0.1))
+            except queue.Empty:
+                continue
+
+            if expanded is None:
+                if interim is None or len(moves) < len(interim[0]):
+                    interim = moves, bound
+                    graph.solutions.append((len(moves), bound, time.perf_counter() - start))
+                    if on_solution is not None:
+                        on_solution(path_to_node(start_node, moves), bound)
+                continue
+
+            received += 1
+            graph.discard(expanded)
+            if keys is not None:
+                dead.update(keys)
+            if moves is not None and (best is None or len(moves) < len(best)):
+                best = moves
+                if not wait_best:
+                    break
+            if dead is not None and best is None and start_node.state in dead:
+                break
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+    if best is None and interim is not None:
+        best, graph.bound = interim
+    if best is None:
+        return graph, None
+    return graph, path_to_node(start_node, best)
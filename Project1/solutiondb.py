@@ -0,0 +1,216 @@
+import sqlite3
+import threading
+import time
+
+from graph import Graph, Node
+from solver import path_moves, path_to_node
+from tube import State
+
+# Tag of the solutions known to be optimal, e.g. the ones of the hints
+OPTIMAL = 'OPTIMAL'
+
+
+class SolutionDB:
+    def __init__(self, path: str = 'solutions.db', max_states: int = 1000000, flush_every: int = 1000) -> None:
+        """Initializes SolutionDB, a persistent store of solved states
+
+        Every state of a solution is saved with its distance to the goal
+        and the next move, so a solution from any of them is found again
+        with a lookup per move. The states are keyed by their canonical
+        key, so the order of the tubes doesn't matter, and the moves are
+        saved as indexes of the sorted tubes. When there are more than
+        max_states states, the least recently used ones are deleted.
+
+        Each solution is tagged with the algorithm that found it, so the
+        watch mode shows the chosen algorithm's solution, and the hints only
+        get the ones tagged OPTIMAL. The lookups don't write to the file:
+        the time each state was used is kept in memory and saved with the
+        next store, or every flush_every lookups.
+
+        Args:
+            path (str, optional): SQLite database file. Defaults to 'solutions.db'.
+            max_states (int, optional): Maximum number of states kept. Defaults to 1000000.
+            flush_every (int, optional): Number of used states kept in memory before saving them. Defaults to 1000.
+        """
+        self.max_states = max_states
+        self.flush_every = flush_every
+        self.used = {}
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS states (key TEXT PRIMARY KEY, dist INTEGER, '
+                          'move_from INTEGER, move_to INTEGER, used REAL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS states_used ON states (used)')
+        self.conn.commit()
+        self.count = self.conn.execute('SELECT COUNT(*) FROM states').fetchone()[0]
+
+    def lookup(self, state: State, algorithm: str = OPTIMAL):
+        """Get the distance to the goal and the next move of a state
+
+        Args:
+            state (State): State to look for
+            algorithm (str, optional): Tag of the solution. Defaults to OPTIMAL.
+
+        Returns:
+            tuple: Distance and next move, None if the state isn't known
+        """
+        with self.lock:
+            row = self.get(state_key(state, algorithm))
+            if row is None:
+                return None
+        dist, move_from, move_to = row
+        if dist == 0:
+            return 0, None
+        order = tube_order(state)
+        return dist, (order[move_from], order[move_to])
+
+    def solution(self, state: State, algorithm: str = OPTIMAL):
+        """Get the moves of the best known solution from a state
+
+        Args:
+            state (State): Start state
+            algorithm (str, optional): Tag of the solution. Defaults to OPTIMAL.
+
+        Returns:
+            list: Moves to the goal, None if the state isn't known
+        """
+        moves = []
+        with self.lock:
+            row = self.get(state_key(state, algorithm))
+            while row is not None and row[0] > 0:
+                order = tube_order(state)
+                move = (order[row[1]], order[row[2]])
+                state = state.apply_move(move[0], move[1])
+                if state is None:
+                    row = None
+                    break
+                moves.append(move)
+                row = self.get(state_key(state, algorithm))
+        if row is None:
+            return None
+        return moves
+
+    def store(self, state: State, moves: list, algorithm: str = OPTIMAL):
+        """Save every state of a solution, unless it already has a shorter one
+
+        Args:
+            state (State): Start state
+            moves (list): Moves from the start state to the goal
+            algorithm (str, optional): Tag of the solution, OPTIMAL only if it's a shortest one. Defaults to OPTIMAL.
+        """
+        now = time.time()
+        with self.lock:
+            self.flush()
+            for i in range(len(moves) + 1):
+                key = state_key(state, algorithm)
+                dist = len(moves) - i
+                row = self.conn.execute('SELECT dist FROM states WHERE key = ?', (key,)).fetchone()
+                if row is None or row[0] > dist:
+                    move_from = move_to = None
+                    if i < len(moves):
+                        index = {tube: j for j, tube in enumerate(tube_order(state))}
+                        move_from, move_to = index[moves[i][0]], index[moves[i][1]]
+                    self.conn.execute('INSERT OR REPLACE INTO states VALUES (?, ?, ?, ?, ?)',
+                                      (key, dist, move_from, move_to, now))
+                    if row is None:
+                        self.count += 1
+                if i < len(moves):
+                    state = state.apply_move(moves[i][0], moves[i][1])
+            self.evict()
+            self.conn.commit()
+
+    def solve(self, start_node: Node, search, algorithm: str = OPTIMAL):
+        """Get a solution from the database, or search for it and save it
+
+        A solution whose bound over the optimal length is above 1, like the
+        last one of an anytime search that ran out of time, isn't saved as
+        an optimal one.
+
+        Args:
+            start_node (Node): Start node
+            search (function): Function that searches from a node and returns the graph and the solution
+            algorithm (str, optional): Tag of the solutions of the search. Defaults to OPTIMAL.
+
+        Returns:
+            tuple: Graph with the solution node, if found
+        """
+        moves = self.solution(start_node.state, algorithm)
+        if moves is not None:
+            return Graph(), path_to_node(start_node, moves)
+
+        graph, goal = search(start_node)
+        if goal is not None and (algorithm != OPTIMAL or graph.bound is None or graph.bound <= 1):
+            self.store(start_node.state, path_moves(graph.path(goal)), algorithm)
+        return graph, goal
+
+    def get(self, key: str):
+        """Get the row of a key and mark it as used in memory, the lock must be held
+
+        Args:
+            key (str): Key of the state
+
+        Returns:
+            tuple: Distance, move_from and move_to, None if not found
+        """
+        row = self.conn.execute('SELECT dist, move_from, move_to FROM states WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            self.used[key] = time.time()
+            if len(self.used) >= self.flush_every:
+                self.flush()
+                self.conn.commit()
+        return row
+
+    def flush(self):
+        """Save when the states were last used in a single statement, the lock must be held
+        """
+        if self.used:
+            self.conn.executemany('UPDATE states SET used = ? WHERE key = ?',
+                                  [(used, key) for key, used in self.used.items()])
+            self.used = {}
+
+    def evict(self):
+        """Delete the least recently used states over the limit, the lock must be held
+        """
+        if self.count <= self.max_states:
+            return
+        excess = self.count - self.max_states
+        self.conn.execute('DELETE FROM states WHERE key IN (SELECT key FROM states ORDER BY used LIMIT ?)',
+                          (excess,))
+        self.count -= excess
+
+    def close(self):
+        """Close the database
+        """
+        with self.lock:
+            self.flush()
+            self.conn.commit()
+            self.conn.close()
+
+
+def state_key(state: State, algorithm: str = OPTIMAL):
+    """Key of a state in the database
+
+    The canonical key is prefixed by the tag of the solution, the number
+    of tubes and the capacity, since the packed keys of different puzzles
+    can be equal.
+
+    Args:
+        state (State): State
+        algorithm (str, optional): Tag of the solution. Defaults to OPTIMAL.
+
+    Returns:
+        str: Key of the state
+    """
+    return '{}/{}/{}/{}/{:x}'.format(algorithm, len(state.tubes), state.capacity, state.ball_bits,
+                                     state.canonical_key())
+
+
+def tube_order(state: State):
+    """Indexes of the tubes in canonical order
+
+    Args:
+        state (State): State
+
+    Returns:
+        list: Index in the state of each tube of the sorted tubes
+    """
+    return sorted(range(len(state.tubes)), key=lambda i: state.tubes[i])
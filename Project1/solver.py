@@ -1,7 +1,12 @@
-from xlwt import Workbook
 from enum import Enum
-from graph import Graph, Node, Tube, Game
-import json
+from graph import Graph, Node, Tube, Game, tube_heuristics
+from tube import State, find_moves, prune_moves, tubes_finished, pack_tubes
+from frontier import QueueFrontier, StackFrontier, PriorityFrontier
+from stats import SearchStats
+from deadstates import DeadStates
+import heapq
+import itertools
+import sys
 import time
 import random
 
@@ -14,29 +19,84 @@ class Algorithm(Enum):
     IDS = 3
     GREEDY = 4
     A_STAR = 5
-
-
-def expand_node(node: Node, algorithm: Algorithm):
+    IDA_STAR = 6
+    BIDIRECTIONAL = 7
+    SMA_STAR = 8
+    VECTOR_BFS = 9
+    ARA_STAR = 10
+    BEAM = 11
+
+
+# Whether each algorithm prunes useless moves by default
+PRUNING = {
+    Algorithm.BFS: True,
+    Algorithm.DFS: True,
+    Algorithm.IDS: True,
+    Algorithm.GREEDY: True,
+    Algorithm.A_STAR: True,
+    Algorithm.IDA_STAR: True,
+    Algorithm.BIDIRECTIONAL: False,
+    Algorithm.SMA_STAR: True,
+    Algorithm.VECTOR_BFS: True,
+    Algorithm.ARA_STAR: True,
+    Algorithm.BEAM: True,
+}
+
+# Whether each algorithm of solver skips the dead states by default, the ones that dive into them
+DEAD_ENDS = {
+    Algorithm.BFS: False,
+    Algorithm.DFS: True,
+    Algorithm.GREEDY: True,
+    Algorithm.A_STAR: False,
+}
+
+
+def expand_node(node: Node, algorithm: Algorithm, prune: bool = False, pruned: dict = None,
+                macro: bool = False, macro_cost: str = 'moves', stats: SearchStats = None, heuristic=None):
     """Expand node and get the list with all the adjacent nodes
 
     Args:
         node (Node): Current node
         algorithm (Algorithm): Choosen Algorithm
+        prune (bool, optional): Remove useless moves and order the others. Defaults to False.
+        pruned (dict, optional): Counts of pruned moves by reason. Defaults to None.
+        macro (bool, optional): Each move pours all the balls of the same color on the top
+            of a tube, as many as fit. Defaults to False.
+        macro_cost (str, optional): Cost of a pour, 'moves' for 1 or 'balls' for the number
+            of balls moved. Defaults to 'moves'.
+        stats (SearchStats, optional): Stats where the time of the heuristics is added. Defaults to None.
+        heuristic (function, optional): Extra admissible heuristics of a state, e.g. PatternDB.heuristic.
+            The cost is the highest of it and the number of wrong balls. It isn't used when a pour
+            costs 1, since PatternDB counts single ball moves and overestimates pours, so the cost is
+            the number of wrong runs. Defaults to None.
 
     Returns:
         list: List with the adjacent nodes
     """
     expansion = []
-    moves = node.gamestate.expand()
+    moves = node.state.expand(prune, node.move, pruned)
 
     for move in moves:
-        new_gamestate = node.gamestate.clone()
         from_i, to_i = move
-        new_gamestate.move_ball(from_i, to_i)
-        new_node = Node(new_gamestate, 0, node.dist + 1)
-
-        if algorithm == Algorithm.GREEDY or algorithm == Algorithm.A_STAR:
-            new_node.set_cost(new_node.number_of_wrong_heuristics())
+        count = node.state.pour_size(from_i, to_i) if macro else 1
+        cost = count if macro_cost == 'balls' else 1
+        new_node = Node(node.state.apply_move(from_i, to_i, count), 0, node.dist + cost)
+        new_node.move = move
+        new_node.balls_moved = count
+
+        if algorithm == Algorithm.GREEDY or algorithm == Algorithm.A_STAR or algorithm == Algorithm.BEAM:
+            if stats is not None:
+                start = time.perf_counter()
+            new_node.update_heuristics(node, from_i, to_i)
+            if macro and macro_cost == 'moves':
+                # A pour can fix several wrong balls, but not two wrong runs
+                new_node.set_cost(new_node.number_of_wrong_runs_heuristics())
+            else:
+                new_node.set_cost(new_node.number_of_wrong_heuristics())
+                if heuristic is not None:
+                    new_node.set_cost(max(new_node.cost, heuristic(new_node.state)))
+            if stats is not None:
+                stats.add_time('heuristics', start)
 
         expansion.append(new_node)
 
@@ -46,63 +106,30 @@ def expand_node(node: Node, algorithm: Algorithm):
     return expansion
 
 
-def get_stack_item(stack, item):
-    """Checks if item is in a list and returns it
-
-    Args:
-        stack (list): List with items
-        item: Item to be found in list
-
-    Returns:
-        Any: Item in the list, if found, None otherwise
-    """
-    try:
-        idx = stack.index(item)
-        return stack[idx]
-    except:
-        return None
-
-
-def add_states_to_stack(stack, new_states, algorithm: Algorithm, node: Node):
-    """Function to add the expanded states to the stack to be expanded later
+def create_frontier(algorithm: Algorithm):
+    """Creates the frontier that holds the states to be expanded later
 
-    This function adds the states according to the algorithm choosen:
-        - BFS -> Add the states to the end of the stack
-        - DFS/IDS -> Add the states to the front of the stack
-        - Greedy -> Add the states to the end of the stack and sort them by the total cost
-        - A* -> Check if state is already in the stack. If it isn't already, add it, else
-        check if the dist is less than the one already in the stack, and if so, update the node.
-        Finish by sorting the nodes by their total cost.
+    The frontier depends on the algorithm choosen:
+        - BFS -> Queue, the states are expanded in the order they were found
+        - DFS/IDS -> Stack, the states of the last expansion are expanded first
+        - Greedy -> Binary heap ordered by the heuristics cost
+        - A* -> Binary heap ordered by the total cost. If a state is already in the
+        frontier, it is only replaced if the new node has a lower total cost.
 
     Args:
-        stack (list): Current stack
-        new_states (list): States to be added to the stack
         algorithm (Algorithm): Choosen Algorithm
-        node (Node): Current node
 
     Returns:
-        list: Stack with the new states
+        Frontier: Empty frontier
     """
     if algorithm == Algorithm.BFS:
-        stack = stack + new_states
+        return QueueFrontier()
     elif algorithm == Algorithm.DFS or algorithm == Algorithm.IDS:
-        stack = new_states + stack
+        return StackFrontier()
     elif algorithm == Algorithm.GREEDY:
-        stack = stack + new_states
-        stack.sort(key=lambda x: x.cost)
+        return PriorityFrontier(lambda x: x.cost)
     elif algorithm == Algorithm.A_STAR:
-        for children in new_states:
-            stack_node = get_stack_item(stack, children)
-            if stack_node is not None:
-                if children.get_total_cost() < stack_node.get_total_cost():
-                    stack_node.set_parent(node)
-                    stack_node.set_dist(node.dist + 1)
-            else:
-                stack.append(children)
-
-        stack.sort(key=lambda x: x.get_total_cost())
-
-    return stack
+        return PriorityFrontier(lambda x: x.get_total_cost())
 
 
 def check_final_depth_solution(expanded: list):
@@ -115,212 +142,957 @@ def check_final_depth_solution(expanded: list):
         Node: Solution, if found, None otherwise
     """
     for node in expanded:
-        if node.gamestate.finished():
+        if node.state.finished():
             print("Found goal!")
             return node
 
     return None
 
 
-def solver(start_node: Node, algorithm: Algorithm, max_depth: int = 5000):
+def solver(start_node: Node, algorithm: Algorithm, max_depth: int = 5000, prune: bool = None,
+           macro: bool = False, macro_cost: str = 'moves', stats: SearchStats = None,
+           keep_graph: bool = False, heuristic=None, dead_ends: bool = None, dead: DeadStates = None):
     """Solver function to find a solution from a start node
 
     Args:
         start_node (Node): Start node
         algorithm (Algorithm): Choosen algorithm to find the solution
         max_depth (int, optional): Max depth to search. Defaults to 5000.
+        prune (bool, optional): Remove useless moves, the counts are saved in graph.pruned.
+            Defaults to the value in PRUNING for the algorithm.
+        macro (bool, optional): Pour all the balls of the same color in a single move,
+            graph.path splits them back into single ball moves. Defaults to False.
+        macro_cost (str, optional): Cost of a pour, 'moves' or 'balls'. Defaults to 'moves'.
+        stats (SearchStats, optional): Instrumentation of the search, saved in graph.stats. The time
+            of each phase is only measured when given. Defaults to None.
+        keep_graph (bool, optional): Keep every visited node in the graph, e.g. to show the explored
+            graph. Otherwise only their counts are kept. Defaults to False.
+        heuristic (function, optional): Extra admissible heuristics of Greedy and A*, e.g.
+            PatternDB.heuristic. It isn't used with macro pours that cost 1 move. Defaults to None.
+        dead_ends (bool, optional): Don't expand the states known to be dead, and save the ones proven
+            dead when all their children are, see DeadStates. The count is saved in graph.pruned.
+            Defaults to the value in DEAD_ENDS for the algorithm, or True if dead is given.
+        dead (DeadStates, optional): Cache of dead states shared with other searches, the states
+            proven dead are added to it. Defaults to a new one.
 
     Returns:
         tuple: Graph with the solution node, if found
     """
-    graph = Graph()
-    stack = [start_node]
+    if prune is None:
+        prune = PRUNING[algorithm]
+    if dead_ends is None:
+        dead_ends = dead is not None or DEAD_ENDS.get(algorithm, False)
+    if dead_ends and dead is None:
+        dead = DeadStates()
+
+    graph = Graph(keep_nodes=keep_graph)
+    graph.stats = stats
+    stack = create_frontier(algorithm)
+    stack.push(start_node)
 
     graph.new_depth()
     graph.add_node(start_node, 1)
 
     graph.new_depth()
+    # Whether any state wasn't expanded because of the max depth
+    cut = False
 
     while len(stack) != 0:
-        node = stack.pop(0)
+        if stats is not None:
+            start = time.perf_counter()
+        node = stack.pop()
 
-        visited_node = get_stack_item(graph.visited, node)
-        if visited_node is not None and node.dist >= visited_node.dist:
+        if stats is not None:
+            stats.add_time('frontier', start)
+            start = time.perf_counter()
+        visited_dist = graph.visited_dist(node)
+        if visited_dist is not None and node.dist >= visited_dist:
+            if stats is not None:
+                stats.add_time('dedup', start)
             continue
 
         graph.visit(node)
         graph.add_node(node, node.dist + 1)
 
-        if algorithm != Algorithm.IDS and node.gamestate.finished():
+        if stats is not None:
+            stats.add_time('dedup', start)
+            stats.expanded(node.dist, graph)
+            start = time.perf_counter()
+        if algorithm != Algorithm.IDS and node.state.finished():
+            if stats is not None:
+                stats.add_time('goal', start)
             print("Found goal!")
             return graph, node
 
-        expanded = expand_node(node, algorithm)
+        if dead_ends and node.state in dead:
+            if stats is not None:
+                stats.add_time('goal', start)
+            graph.pruned['dead'] = graph.pruned.get('dead', 0) + 1
+            dead.resolve(node)
+            continue
 
+        if stats is not None:
+            stats.add_time('goal', start)
+            start = time.perf_counter()
+        expanded = expand_node(node, algorithm, prune, graph.pruned, macro, macro_cost, stats, heuristic)
+
+        if stats is not None:
+            stats.add_time('expand', start)
+            start = time.perf_counter()
+        if dead_ends:
+            # Pouring several balls skips states, so only single ball moves prove a state dead
+            expanded = dead.prune(node, expanded, graph.pruned, not macro)
+            if not expanded and not macro:
+                dead.resolve(node)
+            if stats is not None:
+                stats.add_time('dead', start)
+                start = time.perf_counter()
         if node.dist < max_depth - 1:
-            stack = add_states_to_stack(stack, expanded, algorithm, node)
+            stack.extend(expanded)
+            graph.generate(len(expanded), len(stack))
+            if stats is not None:
+                stats.add_time('frontier', start)
         else:
+            graph.generate(len(expanded), len(stack))
             solution = check_final_depth_solution(expanded)
+            if stats is not None:
+                stats.add_time('goal', start)
             if solution is not None:
                 return graph, solution
+            cut = cut or len(expanded) > 0
 
+    if dead_ends and not cut and not macro:
+        # Every state reachable from the start was searched
+        dead.add(start_node.state)
     return graph, None
 
 
-def ids(start_node: Node, max_depth: int = 5000):
+def ids(start_node: Node, max_depth: int = 5000, transposition: bool = False, prune: bool = None,
+        stats: SearchStats = None):
     """Iterative Deepening Depth-First Search solver
 
+    Each iteration is a depth-limited search that applies and undoes the
+    moves in a single list of tubes, keeping only the current path, like
+    IDA* without heuristics. The number of states expanded in each
+    iteration is saved in graph.iterations.
+
     Args:
         start_node (Node): Start node
         max_depth (int, optional): Maximum depth to search. Defaults to 5000.
+        transposition (bool, optional): Skip states already reached with a lower or equal
+            dist in the same iteration, like the visited states of the solver, which keeps a key
+            of every state reached. Without it, only the path is kept, but the same states are
+            searched many times. Defaults to False.
+        prune (bool, optional): Remove useless moves. Defaults to the value in PRUNING.
+        stats (SearchStats, optional): Instrumentation of the search, saved in graph.stats. Defaults to None.
 
     Returns:
         tuple: graph and the final solution, if found
     """
-    graph = None
+    if prune is None:
+        prune = PRUNING[Algorithm.IDS]
+
+    graph = Graph()
+    graph.stats = stats
+    state = start_node.state
+    tubes = list(state.tubes)
+
+    if state.finished():
+        print("Found goal!")
+        return graph, start_node
+
     for depth in range(1, max_depth):
-        graph, node = solver(start_node, Algorithm.IDS, depth)
-        if node is not None:
+        expanded = graph.expanded_states()
+        moves = search_bounded(tubes, state.capacity, state.num_of_colors, depth, max_depth, graph,
+                               state.ball_bits if transposition else None, prune, False, stats)
+        graph.iterations.append(graph.expanded_states() - expanded)
+        if isinstance(moves, list):
+            print("Found goal!")
+            return graph, path_to_node(start_node, moves)
+        if moves is None:
+            break
+
+    return graph, None
+
+
+def ida_star(start_node: Node, max_depth: int = 5000, transposition: bool = False, prune: bool = None,
+             stats: SearchStats = None):
+    """Iterative Deepening A* solver
+
+    Depth-first searches bounded by the total cost, using the number of
+    wrong balls as heuristics. Every search that fails raises the bound
+    to the lowest total cost that went over it. The moves are applied
+    and undone in a single list of tubes, and only the current path is
+    kept, so the memory used grows with the depth and not with the
+    number of states.
+
+    Args:
+        start_node (Node): Start node
+        max_depth (int, optional): Maximum depth to search. Defaults to 5000.
+        transposition (bool, optional): Skip states already reached with a lower or equal
+            dist in the same iteration. Defaults to False.
+        prune (bool, optional): Remove useless moves. Defaults to the value in PRUNING.
+        stats (SearchStats, optional): Instrumentation of the search, saved in graph.stats. Defaults to None.
+
+    Returns:
+        tuple: graph and the final solution, if found
+    """
+    if prune is None:
+        prune = PRUNING[Algorithm.IDA_STAR]
+
+    graph = Graph()
+    graph.stats = stats
+    state = start_node.state
+    capacity = state.capacity
+    tubes = list(state.tubes)
+    bound = sum(tube_heuristics(balls)[0] for balls in tubes)
+
+    if state.finished():
+        print("Found goal!")
+        return graph, start_node
+
+    while bound < max_depth:
+        expanded = graph.expanded_states()
+        moves = search_bounded(tubes, capacity, state.num_of_colors, bound, max_depth, graph,
+                               state.ball_bits if transposition else None, prune, stats=stats)
+        graph.iterations.append(graph.expanded_states() - expanded)
+        if isinstance(moves, list):
+            print("Found goal!")
+            return graph, path_to_node(start_node, moves)
+        if moves is None:
+            break
+        bound = moves
+
+    return graph, None
+
+
+def search_bounded(tubes: list, capacity: int, num_of_colors: int, bound: int, max_depth: int,
+                   graph: Graph, ball_bits: int = None, prune: bool = True, heuristics: bool = True,
+                   stats: SearchStats = None):
+    """Depth-first search of IDA* and IDS, bounded by the total cost
+
+    The tubes are changed in place while searching and are back to the
+    initial state when the function returns. Without heuristics, the
+    total cost is the depth, so this is a depth-limited search.
+
+    Args:
+        tubes (list): Balls of each tube
+        capacity (int): Capacity of the tubes
+        num_of_colors (int): Number of different colors
+        bound (int): Maximum total cost
+        max_depth (int): Maximum depth to search
+        graph (Graph): Graph where the expanded states are counted
+        ball_bits (int, optional): Bits of a ball in the state keys, None to not use a transposition table.
+        prune (bool, optional): Remove useless moves. Defaults to True.
+        heuristics (bool, optional): Use the number of wrong balls as heuristics. Defaults to True.
+        stats (SearchStats, optional): Stats where the expanded states are counted. Defaults to None.
+
+    Returns:
+        list | int: Moves to the solution if found, else the next bound, or None if there is none
+    """
+    next_bound = None
+    table = {} if ball_bits is not None else None
+    h = sum(tube_heuristics(balls)[0] for balls in tubes) if heuristics else 0
+    path = []
+    undo = []
+    frames = [[find_moves(tubes, capacity), 0]]
+    if prune:
+        frames[0][0] = prune_moves(tubes, capacity, frames[0][0])
+    graph.discard()
+    graph.generate(len(frames[0][0]), 1)
+    if stats is not None:
+        stats.expanded(0, graph)
+
+    while frames:
+        frame = frames[-1]
+        moves, i = frame
+        if i == len(moves):
+            frames.pop()
+            if path:
+                from_i, to_i = path.pop()
+                tubes[from_i], tubes[to_i], h = undo.pop()
+            continue
+        frame[1] += 1
+
+        from_i, to_i = moves[i]
+        from_balls, to_balls = tubes[from_i], tubes[to_i]
+        new_from, new_to = from_balls[:-1], to_balls + from_balls[-1:]
+        new_h = 0
+        if heuristics:
+            new_h = h - tube_heuristics(from_balls)[0] - tube_heuristics(to_balls)[0] \
+                + tube_heuristics(new_from)[0] + tube_heuristics(new_to)[0]
+        g = len(path) + 1
+
+        total = g + new_h
+        if total > bound:
+            if next_bound is None or total < next_bound:
+                next_bound = total
+            continue
+
+        tubes[from_i], tubes[to_i] = new_from, new_to
+        if new_h == 0 and tubes_finished(tubes, capacity, num_of_colors):
+            tubes[from_i], tubes[to_i] = from_balls, to_balls
+            solution = [move for move in path] + [(from_i, to_i)]
+            for (undo_from, undo_to), (old_from, old_to, _) in zip(reversed(path), reversed(undo)):
+                tubes[undo_from], tubes[undo_to] = old_from, old_to
+            return solution
+
+        skip = g >= max_depth
+        if not skip and table is not None:
+            key = pack_tubes(sorted(tubes), capacity, ball_bits)
+            skip = table.get(key, max_depth) <= g
+            if not skip:
+                table[key] = g
+
+        if skip:
+            tubes[from_i], tubes[to_i] = from_balls, to_balls
+            continue
+
+        path.append((from_i, to_i))
+        undo.append((from_balls, to_balls, h))
+        h = new_h
+        children = find_moves(tubes, capacity)
+        if prune:
+            children = prune_moves(tubes, capacity, children, (from_i, to_i))
+        frames.append([children, 0])
+        graph.discard()
+        graph.generate(len(children), len(frames))
+        if stats is not None:
+            stats.expanded(g, graph)
+
+    return next_bound
+
+
+def sma_star(start_node: Node, max_depth: int = 5000, max_nodes: int = 100000, max_bytes: int = None,
+             prune: bool = None, stats: SearchStats = None):
+    """Simplified Memory-bounded A* solver
+
+    A* that keeps at most max_nodes nodes in memory. When there are more,
+    the leaf with the worst total cost (the shallowest one, on ties) is
+    evicted and its cost is backed up to its parent, which remembers the
+    lowest cost of its forgotten children. A parent whose children were all
+    evicted becomes a leaf again, and is expanded again when its backed up
+    cost is the best one. The children of the last expansion are never
+    evicted, so the cap can be exceeded by one expansion. The nodes aren't
+    kept in the graph, only counted, and graph.max_frontier is the maximum
+    number of nodes in memory.
+
+    Args:
+        start_node (Node): Start node
+        max_depth (int, optional): Maximum depth to search. Defaults to 5000.
+        max_nodes (int, optional): Maximum number of nodes in memory. Defaults to 100000.
+        max_bytes (int, optional): Maximum memory of the nodes, in bytes, instead of max_nodes. It is
+            converted to a number of nodes with the size of the start node. Defaults to None.
+        prune (bool, optional): Remove useless moves. Defaults to the value in PRUNING.
+        stats (SearchStats, optional): Instrumentation of the search, saved in graph.stats. Defaults to None.
+
+    Returns:
+        tuple: graph and the final solution, if found
+    """
+    if prune is None:
+        prune = PRUNING[Algorithm.SMA_STAR]
+    if max_bytes is not None:
+        max_nodes = max_bytes // node_size(start_node)
+    infinity = float('inf')
+
+    graph = Graph()
+    graph.stats = stats
+    counter = itertools.count()
+    # Leaves as (total cost, -dist, version, node), the best first
+    best = []
+    # Leaves as (-total cost, dist, version, node), the worst first
+    worst = []
+    # Nodes in memory by key, the one with the lowest dist
+    tree = {}
+    stored = 1
+
+    def push_leaf(node):
+        # Entries whose version isn't the node's current one are stale
+        node.version = next(counter)
+        heapq.heappush(best, (node.f, -node.dist, node.version, node))
+        heapq.heappush(worst, (-node.f, node.dist, node.version, node))
+
+    def backup(node):
+        while node is not None and node.children:
+            f = min(min(child.f for child in node.children), node.forgotten)
+            if f == node.f:
+                break
+            node.f = f
+            node = node.parent
+
+    def forget(leaf):
+        parent = leaf.parent
+        leaf.version = None
+        parent.children.remove(leaf)
+        parent.forgotten = min(parent.forgotten, leaf.f)
+        if tree.get(leaf.key()) is leaf:
+            del tree[leaf.key()]
+        if not parent.children:
+            parent.children = None
+            parent.f = parent.forgotten
+            push_leaf(parent)
+        return parent
+
+    start_node.f = start_node.dist + sum(tube_heuristics(balls)[0] for balls in start_node.state.tubes)
+    start_node.children = None
+    start_node.forgotten = infinity
+    tree[start_node.key()] = start_node
+    push_leaf(start_node)
+
+    while best:
+        f, _, version, node = heapq.heappop(best)
+        if node.version != version:
+            continue
+        if f == infinity:
+            break
+        node.version = None
+
+        if node.state.finished():
+            print("Found goal!")
             return graph, node
 
+        graph.discard()
+        if stats is not None:
+            stats.expanded(node.dist, graph)
+
+        children = []
+        if node.dist < max_depth:
+            for child in expand_node(node, Algorithm.A_STAR, prune, graph.pruned):
+                old = tree.get(child.key())
+                if old is not None and old.dist <= child.dist:
+                    continue
+                child.f = max(node.f, child.get_total_cost())
+                child.children = None
+                child.forgotten = infinity
+                tree[child.key()] = child
+                children.append(child)
+        stored += len(children)
+        graph.generate(len(children), stored)
+
+        if not children:
+            # Dead end: nothing new below this node
+            if node.parent is None:
+                break
+            node.f = infinity
+            parent = forget(node)
+            stored -= 1
+            backup(parent)
+            continue
+
+        node.children = children
+        node.forgotten = infinity
+        for child in children:
+            push_leaf(child)
+        backup(node)
+
+        skipped = []
+        while stored > max_nodes and worst:
+            entry = heapq.heappop(worst)
+            leaf = entry[-1]
+            if leaf.version != entry[2]:
+                continue
+            if leaf.parent is node or leaf.parent is None:
+                skipped.append(entry)
+                continue
+            forget(leaf)
+            stored -= 1
+        for entry in skipped:
+            heapq.heappush(worst, entry)
+
+        if len(best) > 2 * stored + 1024:
+            best = [entry for entry in best if entry[-1].version == entry[2]]
+            worst = [entry for entry in worst if entry[-1].version == entry[2]]
+            heapq.heapify(best)
+            heapq.heapify(worst)
+
     return graph, None
 
 
-def print_solution(path: list):
-    """Prints each gamestate of a solution
+def ara_star(start_node: Node, max_depth: int = 5000, timeout: float = 20, weight: float = 5,
+             decrement: float = 1, prune: bool = None, heuristic=None, on_solution=None,
+             cancel=None, stats: SearchStats = None):
+    """Anytime Repairing A* solver
+
+    A weighted A*, with total cost dist + weight * heuristics, finds a
+    first solution fast. Then the weight is lowered and the search goes on
+    with the same nodes: only the nodes whose dist improved since they were
+    expanded are expanded again. Each solution is at most bound times longer
+    than the optimal one, and the search stops when the time runs out or
+    the solution is proven optimal. Every better solution is saved in
+    graph.solutions as (length, bound, time), and the bound of the last
+    one in graph.bound.
 
     Args:
-        path (list): Path from the start node to the solution
+        start_node (Node): Start node
+        max_depth (int, optional): Maximum depth to search. Defaults to 5000.
+        timeout (float, optional): Maximum time, in seconds. Defaults to 20.
+        weight (float, optional): Weight of the heuristics of the first search. Defaults to 5.
+        decrement (float, optional): How much the weight is lowered after each search. Defaults to 1.
+        prune (bool, optional): Remove useless moves. Defaults to the value in PRUNING.
+        heuristic (function, optional): Extra admissible heuristics, e.g. PatternDB.heuristic. Defaults to None.
+        on_solution (function, optional): Function called with each better solution node and its
+            bound. Defaults to None.
+        cancel (Event, optional): Stop the search when set, like when the time runs out. Defaults to None.
+        stats (SearchStats, optional): Instrumentation of the search, saved in graph.stats. Defaults to None.
+
+    Returns:
+        tuple: graph and the best solution found, if any
     """
-    [x.print() for x in path]
+    if prune is None:
+        prune = PRUNING[Algorithm.ARA_STAR]
 
+    graph = Graph()
+    graph.stats = stats
+    start = time.perf_counter()
+    deadline = start + timeout
+    counter = itertools.count()
+
+    start_node.set_cost(sum(tube_heuristics(balls)[0] for balls in start_node.state.tubes))
+    if heuristic is not None:
+        start_node.set_cost(max(start_node.cost, heuristic(start_node.state)))
+    # Best node of every gamestate reached, by key
+    nodes = {start_node.key(): start_node}
+    # Keys of the nodes to expand (open) and of the expanded nodes whose dist improved (inconsistent)
+    opened = {start_node.key()}
+    closed = set()
+    inconsistent = set()
+    best = start_node if start_node.state.finished() else None
+    published = None
+    bound = float('inf')
+
+    def publish(goal, bound):
+        graph.solutions.append((goal.dist, bound, time.perf_counter() - start))
+        graph.bound = bound
+        if on_solution is not None:
+            on_solution(goal, bound)
+
+    while best is None or best.dist > 0:
+        heap = []
+        for key in opened:
+            node = nodes[key]
+            heapq.heappush(heap, (node.dist + weight * node.cost, node.cost, next(counter), node))
+
+        timed_out = False
+        while heap:
+            f, _, _, node = heap[0]
+            if best is not None and best.dist <= f:
+                break
+            heapq.heappop(heap)
+            key = node.key()
+            if key not in opened or nodes[key] is not node:
+                continue
+            if time.perf_counter() > deadline or (cancel is not None and cancel.is_set()):
+                timed_out = True
+                break
+            opened.discard(key)
+            closed.add(key)
+            graph.discard()
+            if stats is not None:
+                stats.expanded(node.dist, graph)
+            if node.dist >= max_depth:
+                continue
+
+            expanded = expand_node(node, Algorithm.A_STAR, prune, graph.pruned, heuristic=heuristic)
+            graph.generate(len(expanded), len(opened))
+            for child in expanded:
+                child_key = child.key()
+                # A shorter path replaces the node, whose tubes may be in another order
+                old = nodes.get(child_key)
+                if old is not None and old.dist <= child.dist:
+                    continue
+                nodes[child_key] = child
+
+                if child.state.finished():
+                    if best is None or child.dist <= best.dist:
+                        best = child
+                elif child_key in closed:
+                    inconsistent.add(child_key)
+                else:
+                    opened.add(child_key)
+                    heapq.heappush(heap, (child.dist + weight * child.cost, child.cost, next(counter), child))
+
+        if timed_out:
+            # The bound is only known at the end of a search, the last one still holds
+            if best is not None and (published is None or best.dist < published):
+                publish(best, bound)
+            break
+
+        if best is not None:
+            lower = min((nodes[key].get_total_cost() for key in opened | inconsistent), default=best.dist)
+            bound = min(weight, best.dist / lower) if lower > 0 else 1
+            if published is None or best.dist < published or bound == 1:
+                published = best.dist
+                publish(best, bound)
+            if bound <= 1:
+                break
+        if weight <= 1:
+            break
+        weight = max(1, weight - decrement)
+        opened |= inconsistent
+        inconsistent = set()
+        closed = set()
+
+    if best is not None:
+        print("Found goal!")
+    return graph, best
+
+
+def beam(start_node: Node, max_depth: int = 5000, width: int = 100, restarts: int = 3, diversity: float = 1,
+         seed: int = None, prune: bool = None, stats: SearchStats = None):
+    """Beam search solver, driven by the node score heuristics
+
+    Each depth keeps only the width children of the current beam with the
+    best node score, chosen with a partial sort, so the memory grows with
+    width * depth. The states already in a beam aren't added again. It
+    isn't complete: when the beam dies out or reaches the max depth, the
+    search restarts with a beam twice as wide and some random noise added
+    to the scores, more on each restart, so a different part of the tree
+    is explored. The noise is measured in score steps, one ball in a
+    sequence, since a smaller noise only breaks the ties.
 
-def generate_puzzle(colors: int):
-    """Puzzle generator
+    Args:
+        start_node (Node): Start node
+        max_depth (int, optional): Maximum depth to search. Defaults to 5000.
+        width (int, optional): Number of nodes kept in each depth by the first search. Defaults to 100.
+        restarts (int, optional): Number of searches after the first one fails. Defaults to 3.
+        diversity (float, optional): Noise added to the scores on each restart, in score steps. Defaults to 1.
+        seed (int, optional): Seed of the noise. Defaults to None.
+        prune (bool, optional): Remove useless moves. Defaults to the value in PRUNING.
+        stats (SearchStats, optional): Instrumentation of the search, saved in graph.stats. Defaults to None.
+
+    Returns:
+        tuple: graph and the final solution, if found
+    """
+    if prune is None:
+        prune = PRUNING[Algorithm.BEAM]
+
+    graph = Graph()
+    graph.stats = stats
+    rng = random.Random(seed)
+
+    if start_node.state.finished():
+        print("Found goal!")
+        return graph, start_node
+
+    for attempt in range(restarts + 1):
+        # The scores grow by 5 for each ball in a sequence
+        noise = 5 * diversity * attempt
+        layer_width = width * 2 ** attempt
+        layer = [start_node]
+        seen = {start_node.key()}
+        for depth in range(max_depth):
+            children = []
+            for node in layer:
+                graph.discard()
+                if stats is not None:
+                    stats.expanded(depth, graph)
+                for child in expand_node(node, Algorithm.BEAM, prune, graph.pruned):
+                    if child.state.finished():
+                        print("Found goal!")
+                        return graph, child
+                    if child.key() not in seen:
+                        seen.add(child.key())
+                        children.append(child)
+            graph.generate(len(children), len(children))
+            if not children:
+                break
+
+            if noise:
+                layer = heapq.nlargest(layer_width, children, key=lambda x: (x.node_score_heuristic()
+                                                                             + noise * rng.random(), -x.cost))
+            else:
+                layer = heapq.nlargest(layer_width, children, key=lambda x: (x.node_score_heuristic(), -x.cost))
+            kept = {node.key() for node in layer}
+            seen.difference_update(child.key() for child in children if child.key() not in kept)
+        graph.iterations.append(graph.expanded_states())
+
+    return graph, None
+
+
+def node_size(node: Node):
+    """Estimate the memory used by a node, with its state and its frontier entries
 
     Args:
-        colors (int): Number of different coloured balls in the puzzle
+        node (Node): Node
 
     Returns:
-        Game: Generated Game
+        int: Size in bytes
     """
-    balls_list = []
-    for i in range(1, colors + 1):
-        color = [i] * 4
-        balls_list += color
-    random.shuffle(balls_list)
+    state = node.state
+    size = sys.getsizeof(node) + sys.getsizeof(node.__dict__) + sys.getsizeof(state)
+    size += sys.getsizeof(state.tubes) + sum(sys.getsizeof(balls) for balls in state.tubes)
+    return size + 2 * sys.getsizeof((0, 0, 0, node))
 
-    tubes_list = []
-    pos = 0
-    for i in range(colors):
-        tubes_list.append(Tube(balls_list[pos:pos + 4]))
-        pos += 4
-    tubes_list.append(Tube([]))
-    tubes_list.append(Tube([]))
 
-    return Game(tubes_list)
+def bidirectional(start_node: Node, max_depth: int = 5000, stats: SearchStats = None):
+    """Bidirectional Breadth-First Search solver
 
+    A forward search from the start node and a backward search from the
+    goal meet in the middle. Since the order of the tubes doesn't matter,
+    there is a single goal state modulo tube order: one completed tube for
+    each color and the other tubes empty. Both searches use canonical keys,
+    and the backward one generates the states that can reach a state with
+    a single move. A whole level of the smallest side is expanded at a time,
+    and the best meeting state of that level gives an optimal solution.
 
-def create_sheet():
-    """Creates a sheet to save solver statistics
+    Args:
+        start_node (Node): Start node
+        max_depth (int, optional): Maximum number of moves of the solution. Defaults to 5000.
+        stats (SearchStats, optional): Instrumentation of the search, saved in graph.stats. The
+            backward states are counted with negative depths. Defaults to None.
 
     Returns:
-        tuple: Tuple with the sheets for each algorithm
+        tuple: graph and the final solution, if found
     """
-    wb = Workbook()
-    sheet_A = wb.add_sheet('A_star sheet', True)
-    sheet_greedy = wb.add_sheet('Greedy sheet', True)
-    sheet_ids = wb.add_sheet('IDS sheet', True)
-    sheet_dfs = wb.add_sheet('DFS sheet', True)
-    sheet_bfs = wb.add_sheet('BFS sheet', True)
-    return wb, sheet_A, sheet_greedy, sheet_ids, sheet_dfs, sheet_bfs
+    graph = Graph()
+    graph.stats = stats
+    state = start_node.state
+    capacity = state.capacity
+
+    colors = {}
+    for balls in state.tubes:
+        for ball in balls:
+            colors[ball] = colors.get(ball, 0) + 1
+    if any(count != capacity for count in colors.values()) or len(colors) > len(state.tubes):
+        return graph, None
+
+    goal = sorted([(color,) * capacity for color in colors] + [()] * (len(state.tubes) - len(colors)))
+
+    def canonical(tubes):
+        return pack_tubes(sorted(tubes), capacity, state.ball_bits)
+
+    # Forward states: key -> (tubes, parent key, move, dist)
+    forward = {canonical(state.tubes): (state.tubes, None, None, 0)}
+    # Backward states: key -> (sorted tubes, key of the next state towards the goal, dist)
+    backward = {canonical(goal): (tuple(goal), None, 0)}
+    forward_layer = [canonical(state.tubes)]
+    backward_layer = [canonical(goal)]
+    forward_depth = 0
+    backward_depth = 0
+
+    meeting = [key for key in forward_layer if key in backward]
+    while not meeting and forward_layer and backward_layer and forward_depth + backward_depth < max_depth:
+        new_layer = []
+        if len(forward_layer) <= len(backward_layer):
+            forward_depth += 1
+            for key in forward_layer:
+                tubes = forward[key][0]
+                graph.discard()
+                if stats is not None:
+                    stats.expanded(forward_depth - 1, graph)
+                moves = find_moves(tubes, capacity)
+                for from_i, to_i in moves:
+                    child = list(tubes)
+                    child[from_i], child[to_i] = tubes[from_i][:-1], tubes[to_i] + tubes[from_i][-1:]
+                    child_key = canonical(child)
+                    if child_key not in forward:
+                        forward[child_key] = (tuple(child), key, (from_i, to_i), forward_depth)
+                        new_layer.append(child_key)
+                graph.generate(len(moves), len(new_layer) + len(backward_layer))
+            forward_layer = new_layer
+            meeting = [key for key in forward_layer if key in backward]
+        else:
+            backward_depth += 1
+            for key in backward_layer:
+                tubes = backward[key][0]
+                graph.discard()
+                if stats is not None:
+                    stats.expanded(1 - backward_depth, graph)
+                parents = predecessors(tubes, capacity)
+                for parent in parents:
+                    parent_key = canonical(parent)
+                    if parent_key not in backward:
+                        backward[parent_key] = (tuple(sorted(parent)), key, backward_depth)
+                        new_layer.append(parent_key)
+                graph.generate(len(parents), len(new_layer) + len(forward_layer))
+            backward_layer = new_layer
+            meeting = [key for key in backward_layer if key in forward]
+
+    if not meeting:
+        return graph, None
+
+    best = min(meeting, key=lambda x: forward[x][3] + backward[x][2])
+
+    moves = []
+    key = best
+    while forward[key][1] is not None:
+        moves.append(forward[key][2])
+        key = forward[key][1]
+    moves.reverse()
+
+    tubes = list(forward[best][0])
+    key = backward[best][1]
+    while key is not None:
+        target = backward[key][0]
+        for from_i, to_i in find_moves(tubes, capacity):
+            child = list(tubes)
+            child[from_i], child[to_i] = tubes[from_i][:-1], tubes[to_i] + tubes[from_i][-1:]
+            if tuple(sorted(child)) == target:
+                moves.append((from_i, to_i))
+                tubes = child
+                break
+        key = backward[key][1]
+
+    print("Found goal!")
+    return graph, path_to_node(start_node, moves)
+
+
+def predecessors(tubes, capacity: int):
+    """Get the tubes of every state that reaches the given one with a single move
+
+    A ball on top of a tube could have come from any other tube that isn't
+    full, as long as the move was valid, that is, the ball below it has
+    the same color or there is no ball below it.
+
+    Args:
+        tubes (tuple): Balls of each tube
+        capacity (int): Capacity of the tubes
+
+    Returns:
+        list: Tubes of the previous states
+    """
+    states = []
+    for to_i, to_balls in enumerate(tubes):
+        if not to_balls or (len(to_balls) > 1 and to_balls[-2] != to_balls[-1]):
+            continue
+        for from_i, from_balls in enumerate(tubes):
+            if from_i == to_i or len(from_balls) == capacity:
+                continue
+            parent = list(tubes)
+            parent[to_i], parent[from_i] = to_balls[:-1], from_balls + to_balls[-1:]
+            states.append(parent)
+    return states
+
+
+def path_to_node(start_node: Node, moves: list):
+    """Create the nodes of a path from a list of moves
+
+    Args:
+        start_node (Node): Start node
+        moves (list): Moves from the start node
+
+    Returns:
+        Node: Last node of the path, linked to the start node by its parents
+    """
+    node = start_node
+    for move in moves:
+        child = Node(node.state.apply_move(move[0], move[1]), 0, node.dist + 1)
+        child.move = move
+        child.set_parent(node)
+        node = child
+    return node
 
 
-def write_to_sheet(sheet, row, col, exec_time, size, graph, path):
-    """Writes algorithm information to the sheet
+def path_moves(path: list):
+    """Get the moves of a path
 
     Args:
-        sheet (Worksheet): Sheet to write to
-        row (int): Row to write to
-        col (int): Column to write to
-        exec_time (double): Algorithm execution time
-        size (int): Number of different colors in level
-        graph (Graph): Final Graph
-        path (list): Path from the start node to a solution
+        path (list): Path from the start node to a solution, with single ball moves
+
+    Returns:
+        list: Moves between each node of the path and the next one
     """
-    sheet.write(0, 0, "Expanded States")
-    sheet.write(0, 1, "Solution Size")
-    sheet.write(0, 2, "Time")
-    sheet.write(0, 3, "Puzzle Size")
-    sheet.write(row, col, graph.expanded_states())
-    if path is not None:
-        sheet.write(row, col + 1, len(path))
-    else:
-        sheet.write(row, col + 1, "Failed")
-    sheet.write(row, col + 2, exec_time)
-    sheet.write(row, col + 3, size)
+    return [node.move for node in path[1:]]
 
 
-if __name__ == "__main__":
-    """Main function to test algorithms
+def replay_moves(state: State, moves: list):
+    """Make the moves of a solution, one ball at a time, to check them
+
+    Args:
+        state (State): Start state
+        moves (list): Single ball moves, e.g. from path_moves
+
+    Returns:
+        State: State after the last move, None if any of the moves isn't valid
     """
-    wb, sheet_A, sheet_greedy, sheet_ids, sheet_dfs, sheet_bfs = create_sheet()
+    for from_i, to_i in moves:
+        state = state.apply_move(from_i, to_i)
+        if state is None:
+            return None
+    return state
+
+
+def solve(start_node: Node, algorithm: Algorithm, max_depth: int = 5000, **params):
+    """Find a solution with any of the algorithms
+
+    Args:
+        start_node (Node): Start node
+        algorithm (Algorithm): Choosen algorithm to find the solution
+        max_depth (int, optional): Max depth to search. Defaults to 5000.
+        **params: Other arguments of the algorithm's function
 
-    with open('levels.json') as f:
-        levels = json.load(f)
+    Returns:
+        tuple: Graph with the solution node, if found
+    """
+    if algorithm == Algorithm.IDS:
+        return ids(start_node, max_depth, **params)
+    elif algorithm == Algorithm.IDA_STAR:
+        return ida_star(start_node, max_depth, **params)
+    elif algorithm == Algorithm.BIDIRECTIONAL:
+        return bidirectional(start_node, max_depth, **params)
+    elif algorithm == Algorithm.SMA_STAR:
+        return sma_star(start_node, max_depth, **params)
+    elif algorithm == Algorithm.ARA_STAR:
+        return ara_star(start_node, max_depth, **params)
+    elif algorithm == Algorithm.BEAM:
+        return beam(start_node, max_depth, **params)
+    elif algorithm == Algorithm.VECTOR_BFS:
+        # numpy is only needed by this algorithm
+        from vectorbfs import vector_bfs
+        return vector_bfs(start_node, max_depth, **params)
+    return solver(start_node, algorithm, max_depth, **params)
 
-    for level in levels:
-        tubes = levels[level]['tubes']
-        new_tubes = []
-        for tube in tubes:
-            new_tubes.append(Tube(tube))
-        levels[level] = new_tubes
 
+def print_solution(path: list):
+    """Prints each gamestate of a solution
+
+    Args:
+        path (list): Path from the start node to the solution
+    """
+    [x.print() for x in path]
+
+
+def generate_puzzle(colors: int, seed: int = None, capacity: int = 4, empty: int = 2):
+    """Puzzle generator
+
+    Args:
+        colors (int): Number of different coloured balls in the puzzle
+        seed (int, optional): Seed of the shuffle, for the same puzzle every time. Defaults to None.
+        capacity (int, optional): Capacity of the tubes, and balls of each color. Defaults to 4.
+        empty (int, optional): Number of empty tubes. Defaults to 2.
+
+    Returns:
+        Game: Generated Game
+    """
+    balls_list = []
+    for i in range(1, colors + 1):
+        color = [i] * capacity
+        balls_list += color
+    random.Random(seed).shuffle(balls_list)
+
+    tubes_list = []
     pos = 0
-    result = 1
-    for level in levels:
-        game = Game(levels[level])
-        init_state = Node(game)
+    for i in range(colors):
+        tubes_list.append(Tube(balls_list[pos:pos + capacity], capacity))
+        pos += capacity
+    for i in range(empty):
+        tubes_list.append(Tube([], capacity))
 
-        try:
-            start = time.perf_counter()
-            graph, goal = solver(init_state, Algorithm.A_STAR, 30)
-            end = (time.perf_counter() - start)
-            write_to_sheet(sheet_A, result, pos, end, game.num_of_colors, graph, graph.path(goal))
-        except:
-            print("No solution found! - A*")
+    return Game(tubes_list)
 
-        try:
-            start = time.perf_counter()
-            graph, goal = solver(init_state, Algorithm.GREEDY, 30)
-            end = (time.perf_counter() - start)
-            write_to_sheet(sheet_greedy, result, pos, end, game.num_of_colors, graph, graph.path(goal))
-        except:
-            print("No solution found! - Greedy")
 
-        try:
-            start = time.perf_counter()
-            graph, goal = ids(init_state, 60)
-            end = (time.perf_counter() - start)
-            write_to_sheet(sheet_ids, result, pos, end, game.num_of_colors, graph, graph.path(goal))
-        except:
-            print("No solution found! - IDS")
+if __name__ == "__main__":
+    """Main function to test algorithms
 
-        try:
-            start = time.perf_counter()
-            graph, goal = solver(init_state, Algorithm.DFS, 60)
-            end = (time.perf_counter() - start)
-            write_to_sheet(sheet_dfs, result, pos, end, game.num_of_colors, graph, graph.path(goal))
-        except:
-            print("No solution found! - DFS")
+    Runs the benchmark suite, see benchmark.py, and saves the results
+    to Results.json and Results.csv.
+    """
+    from benchmark import create_instances, run_benchmark, write_json, write_csv
 
-        try:
-            start = time.perf_counter()
-            graph, goal = solver(init_state, Algorithm.BFS, 15)
-            end = (time.perf_counter() - start)
-            write_to_sheet(sheet_bfs, result, pos, end, game.num_of_colors, graph, graph.path(goal))
-        except:
-            print("No solution found! - BFS")
-
-        result += 1
-        wb.save('Results.xls')
+    results = run_benchmark(create_instances('levels.json', []), 'Results.jsonl', timeout=60)
+    for result in results:
+        if result['status'] != 'solved':
+            print("No solution found! - " + result['level'] + " " + result['algorithm'])
+
+    write_json(results, 'Results.json')
+    write_csv(results, 'Results.csv')
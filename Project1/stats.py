@@ -0,0 +1,80 @@
+import time
+
+
+class SearchStats:
+    def __init__(self, callback=None, every: int = 1000) -> None:
+        """Initializes SearchStats, the instrumentation of a search
+
+        The solvers only update the stats when they are given one, so a
+        search without stats has no extra cost. The time of each phase of
+        the search is added up in timers, the number of times each phase
+        ran in counters and the number of expanded states of each depth in
+        depths.
+
+        Args:
+            callback (function, optional): Function called with the stats and the graph every
+                few expansions, e.g. to show the progress. Defaults to None.
+            every (int, optional): Number of expansions between each call of the callback. Defaults to 1000.
+        """
+        self.callback = callback
+        self.every = every
+        self.start = time.perf_counter()
+        self.expansions = 0
+        self.counters = {}
+        self.timers = {}
+        self.depths = {}
+
+    def add_time(self, phase: str, start: float):
+        """Add the time of a phase, from its start until now
+
+        Args:
+            phase (str): Name of the phase
+            start (float): Value of time.perf_counter when the phase started
+        """
+        self.timers[phase] = self.timers.get(phase, 0) + time.perf_counter() - start
+        self.counters[phase] = self.counters.get(phase, 0) + 1
+
+    def expanded(self, depth: int, graph=None, count: int = 1):
+        """Count expanded states and call the callback if it's time to
+
+        Args:
+            depth (int): Depth of the expanded states
+            graph (Graph, optional): Graph of the search, given to the callback. Defaults to None.
+            count (int, optional): Number of expanded states. Defaults to 1.
+        """
+        self.expansions += count
+        self.depths[depth] = self.depths.get(depth, 0) + count
+        if self.callback is not None and self.expansions // self.every != (self.expansions - count) // self.every:
+            self.callback(self, graph)
+
+    def elapsed(self):
+        """Time since the stats were created
+
+        Returns:
+            float: Elapsed time, in seconds
+        """
+        return time.perf_counter() - self.start
+
+    def rate(self):
+        """Expanded states per second
+
+        Returns:
+            float: Expansions per second
+        """
+        elapsed = self.elapsed()
+        return self.expansions / elapsed if elapsed > 0 else 0
+
+    def as_dict(self):
+        """Get the stats as a dictionary, e.g. to save them as JSON
+
+        Returns:
+            dict: Stats
+        """
+        return {
+            'expansions': self.expansions,
+            'elapsed': self.elapsed(),
+            'rate': self.rate(),
+            'counters': dict(self.counters),
+            'timers': dict(self.timers),
+            'depths': {str(depth): count for depth, count in sorted(self.depths.items())},
+        }
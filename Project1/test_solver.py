@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from graph import Node
+from solver import Algorithm, solve
+from tube import State
+
+
+def load_level(name: str):
+    """Start state of a level
+
+    Args:
+        name (str): Name of the level in levels.json
+
+    Returns:
+        State: Start state
+    """
+    with open('levels.json') as f:
+        tubes = json.load(f)[name]['tubes']
+    return State(tuple(tuple(balls) for balls in tubes), 4)
+
+
+def test_macro_a_star_ignores_pattern_database():
+    # The pattern database counts single ball moves, so it overestimates pours
+    patterndb = pytest.importorskip('patterndb')
+    state = load_level('10')
+    keys, dists = patterndb.build(len(state.tubes), state.capacity, state.num_of_colors)
+    table = patterndb.PatternDB(keys, dists, len(state.tubes), state.capacity, state.num_of_colors)
+
+    _, with_table = solve(Node(state), Algorithm.A_STAR, 60, macro=True, heuristic=table.heuristic)
+    _, without_table = solve(Node(state), Algorithm.A_STAR, 60, macro=True)
+    _, bfs = solve(Node(state), Algorithm.BFS, 60, macro=True)
+
+    assert with_table.dist == without_table.dist == bfs.dist == 19
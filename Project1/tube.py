@@ -1,5 +1,3 @@
-import copy
-
 class Tube:
     def __init__(self, balls: list = None, capacity: int = 4) -> None:
         """Initializes Tube
@@ -52,9 +50,7 @@ class Tube:
         Returns:
             int: Removed ball
         """
-        top_ball = self.get_ball()
-        self.balls = self.balls[:-1]
-        return top_ball
+        return self.balls.pop()
 
     def all_same_colored(self):
         """Check if all the balls in the tube have the same color
@@ -109,7 +105,7 @@ class Tube:
         Returns:
             Tube: New cloned tube
         """
-        return copy.deepcopy(self)
+        return Tube(list(self.balls), self.capacity)
 
     def is_completed(self):
         """Check if tube is completed
@@ -119,6 +115,23 @@ class Tube:
         """
         return self.all_same_colored() and self.is_full()
 
+    def key(self, ball_bits: int):
+        """Integer key of a tube
+
+        Each slot of the tube takes ball_bits bits, from the bottom to the top.
+        Empty slots are 0, which never collides with a ball since balls start at 1.
+
+        Args:
+            ball_bits (int): Number of bits used by each ball
+
+        Returns:
+            int: Key of the tube
+        """
+        key = 0
+        for i, ball in enumerate(self.balls):
+            key |= ball << (i * ball_bits)
+        return key
+
 
 class Game:
     def __init__(self, tubes: list) -> None:
@@ -129,6 +142,7 @@ class Game:
         """
         self.tubes = tubes
         self.num_of_colors = self.calculate_colors()
+        self.ball_bits = self.calculate_ball_bits()
 
     def calculate_colors(self):
         """Get number of colors in the game
@@ -143,6 +157,18 @@ class Game:
                 colors.add(ball)
         return len(colors)
 
+    def calculate_ball_bits(self):
+        """Get number of bits needed to store a ball in a state key
+
+        Returns:
+            int: Number of bits of the biggest ball in the game
+        """
+        biggest = 0
+        for tube in self.tubes:
+            for ball in tube.get_balls():
+                biggest = max(biggest, ball)
+        return max(biggest.bit_length(), 1)
+
     def finished(self):
         """Checks if the game is finished
 
@@ -155,9 +181,14 @@ class Game:
                 completed_tubes += 1
         return completed_tubes == self.num_of_colors
 
-    def expand(self):
+    def expand(self, prune: bool = False, last_move: tuple = None, pruned: dict = None):
         """Expand the current game state
 
+        Args:
+            prune (bool, optional): Remove useless moves and order the others, see State.prune_moves. Defaults to False.
+            last_move (tuple, optional): Move that led to this gamestate, used when pruning. Defaults to None.
+            pruned (dict, optional): Counts of pruned moves by reason, updated when pruning. Defaults to None.
+
         Returns:
             list: List of possible moves
         """
@@ -168,6 +199,8 @@ class Game:
             from_indexes = self.find_moves_from_tube(to_index)
             for from_idx in from_indexes:
                 moves.append((from_idx, to_index))
+        if prune:
+            moves = State.from_game(self).prune_moves(moves, last_move, pruned)
         return moves
 
     def find_moves_from_tube(self, to_index: int):
@@ -206,6 +239,24 @@ class Game:
         else:
             return self.tubes[to_i].put_ball(self.tubes[from_i].remove_ball())
 
+    def pour_balls(self, from_i: int, to_i: int):
+        """Moves all the balls of the same color from the top of a tube to
+        another, as many as fit, like in the real game
+
+        Args:
+            from_i (int): Index of the tube to remove the balls
+            to_i (int): Index of the tube to put the balls
+
+        Returns:
+            int: Number of balls moved
+        """
+        moved = 0
+        while self.move_ball(from_i, to_i):
+            moved += 1
+            if self.tubes[from_i].is_empty() or self.tubes[from_i].get_ball() != self.tubes[to_i].get_ball():
+                break
+        return moved
+
     def get_tubes(self):
         """Getter for tubes
 
@@ -228,10 +279,37 @@ class Game:
                 return False
         return True
 
+    def key(self):
+        """Integer key that identifies the gamestate
+
+        The tubes are packed one after the other, each one taking
+        capacity * ball_bits bits, so two gamestates have the same
+        key only if they have the same balls in the same tubes.
+
+        Returns:
+            int: Key of the gamestate
+        """
+        key = 0
+        for tube in self.tubes:
+            key = (key << (tube.capacity * self.ball_bits)) | tube.key(self.ball_bits)
+        return key
+
+    def canonical_key(self, relabel_colors: bool = False):
+        """Integer key of the gamestate, independent of the order of the tubes
+
+        Args:
+            relabel_colors (bool, optional): Also ignore which color is which. Defaults to False.
+
+        Returns:
+            int: Canonical key of the gamestate
+        """
+        return State.from_game(self).canonical_key(relabel_colors)
+
     def print(self):
         """Print a game state
         """
-        for places in range(3, -1, -1):
+        capacity = max((tube.capacity for tube in self.tubes), default=0)
+        for places in range(capacity - 1, -1, -1):
             for tube in self.tubes:
                 tube.print(places)
             print("")
@@ -244,5 +322,421 @@ class Game:
         Returns:
             Game: New cloned gamestate
         """
-        return copy.deepcopy(self)
+        return Game([tube.clone() for tube in self.tubes])
+
+
+
+def pack_tubes(tubes, capacity: int, ball_bits: int):
+    """Packs tubes into an integer key
+
+    Each tube takes capacity * ball_bits bits, like in Game.key.
+
+    Args:
+        tubes (iterable): Balls of each tube
+        capacity (int): Capacity of the tubes
+        ball_bits (int): Number of bits used by each ball
+
+    Returns:
+        int: Key of the tubes
+    """
+    tube_bits = capacity * ball_bits
+    key = 0
+    for balls in tubes:
+        tube_key = 0
+        for i, ball in enumerate(balls):
+            tube_key |= ball << (i * ball_bits)
+        key = (key << tube_bits) | tube_key
+    return key
+
+
+def tubes_finished(tubes, capacity: int, num_of_colors: int):
+    """Checks if the tubes of a game are all sorted
+
+    Args:
+        tubes (list): Balls of each tube
+        capacity (int): Capacity of the tubes
+        num_of_colors (int): Number of different colors
+
+    Returns:
+        boolean: True if the game is finished, False otherwise
+    """
+    completed_tubes = 0
+    for balls in tubes:
+        if len(balls) == capacity and balls.count(balls[0]) == capacity:
+            completed_tubes += 1
+    return completed_tubes == num_of_colors
+
+
+def find_moves(tubes, capacity: int):
+    """Get the possible moves, in the same order as Game.expand
+
+    Args:
+        tubes (list): Balls of each tube
+        capacity (int): Capacity of the tubes
+
+    Returns:
+        list: List of possible moves
+    """
+    moves = []
+    for to_index, to_balls in enumerate(tubes):
+        if len(to_balls) == capacity:
+            continue
+        for from_index, from_balls in enumerate(tubes):
+            if from_index == to_index or not from_balls:
+                continue
+            if not to_balls or from_balls[-1] == to_balls[-1]:
+                moves.append((from_index, to_index))
+    return moves
+
+
+def prune_moves(tubes, capacity: int, moves: list, last_move: tuple = None, pruned: dict = None):
+    """Remove the moves that are useless or symmetric to another move
+
+    The moves removed are:
+        - completed -> Moves out of a completed tube
+        - uniform -> Moves from a tube with a single color into an empty tube,
+        since it only splits the balls of the same color in two tubes
+        - empty -> Moves into an empty tube when the same ball can already go
+        into another empty tube
+        - inverse -> The move that undoes the last move
+
+    The other moves are ordered so the ones that complete a tube come first,
+    then the ones onto a ball of the same color and then the ones into empty tubes.
+
+    Args:
+        tubes (list): Balls of each tube
+        capacity (int): Capacity of the tubes
+        moves (list): Possible moves
+        last_move (tuple, optional): Move that led to these tubes. Defaults to None.
+        pruned (dict, optional): Counts of pruned moves by reason, updated here. Defaults to None.
+
+    Returns:
+        list: Useful moves, best first
+    """
+    kept = []
+    empty_moves = set()
+    for move in moves:
+        from_i, to_i = move
+        from_balls = tubes[from_i]
+        to_balls = tubes[to_i]
+        uniform = from_balls.count(from_balls[0]) == len(from_balls)
+
+        if uniform and len(from_balls) == capacity:
+            reason = 'completed'
+        elif uniform and not to_balls:
+            reason = 'uniform'
+        elif not to_balls and from_i in empty_moves:
+            reason = 'empty'
+        elif last_move is not None and move == (last_move[1], last_move[0]):
+            reason = 'inverse'
+        else:
+            if not to_balls:
+                empty_moves.add(from_i)
+            kept.append(move)
+            continue
+
+        if pruned is not None:
+            pruned[reason] = pruned.get(reason, 0) + 1
+
+    kept.sort(key=lambda x: move_priority(tubes, capacity, x))
+    return kept
+
+
+def move_priority(tubes, capacity: int, move: tuple):
+    """Priority of a move, lower first
+
+    Args:
+        tubes (list): Balls of each tube
+        capacity (int): Capacity of the tubes
+        move (tuple): Move to evaluate
+
+    Returns:
+        int: 0 if the move completes a tube, 1 if it goes onto a ball of the same color, 2 otherwise
+    """
+    to_balls = tubes[move[1]]
+    if not to_balls:
+        return 2
+    if len(to_balls) + 1 == capacity and to_balls.count(to_balls[0]) == len(to_balls):
+        return 0
+    return 1
+
+
+def refine_colors(tubes, classes: dict):
+    """Split the classes of the colors until the colors of a class can't be told apart
+
+    Each color is described by its class and the place of each of its
+    balls, in a tube described by the classes of its balls. Colors with
+    different descriptions go to different classes, numbered in the order
+    of their descriptions, so the numbers don't depend on the colors.
+
+    Args:
+        tubes (tuple): Balls of each tube
+        classes (dict): Class of each color
+
+    Returns:
+        dict: Refined class of each color
+    """
+    while True:
+        places = {color: [] for color in classes}
+        for balls in tubes:
+            shape = tuple(classes[ball] for ball in balls)
+            for i, ball in enumerate(balls):
+                places[ball].append((shape, i))
+        descriptions = {color: (classes[color], tuple(sorted(places[color]))) for color in classes}
+        rank = {description: i for i, description in enumerate(sorted(set(descriptions.values())))}
+        refined = {color: rank[description] for color, description in descriptions.items()}
+        if len(rank) == len(set(classes.values())):
+            return refined
+        classes = refined
+
+
+def relabel_tubes(tubes, classes: dict):
+    """Smallest sorted tubes over the renamings of the colors that keep their classes in order
+
+    When a class has several colors, each of them is put first in turn
+    and the smallest result is kept. A color isn't tried when swapping it
+    with one already tried gives the same tubes, since both give the same
+    result, so symmetric states like the solved ones stay fast.
+
+    Args:
+        tubes (tuple): Balls of each tube
+        classes (dict): Class of each color, from refine_colors
+
+    Returns:
+        tuple: Sorted tuple with the balls of each tube, with the colors renamed 1..n
+    """
+    sizes = {}
+    for value in classes.values():
+        sizes[value] = sizes.get(value, 0) + 1
+    tied = [value for value, size in sizes.items() if size > 1]
+    if not tied:
+        return tuple(sorted(tuple(classes[ball] + 1 for ball in balls) for balls in tubes))
+
+    target = min(tied)
+    sorted_tubes = sorted(tubes)
+    best = None
+    tried = []
+    for color in sorted(x for x in classes if classes[x] == target):
+        if any(sorted(tuple(swap_color(ball, color, other) for ball in balls) for balls in tubes) == sorted_tubes
+               for other in tried):
+            continue
+        tried.append(color)
+        split = {x: 2 * value + (x != color) for x, value in classes.items()}
+        result = relabel_tubes(tubes, refine_colors(tubes, split))
+        if best is None or result < best:
+            best = result
+    return best
+
+
+def swap_color(ball: int, first: int, second: int):
+    """Color of a ball after swapping two colors
+
+    Args:
+        ball (int): Color of the ball
+        first (int): First color
+        second (int): Second color
+
+    Returns:
+        int: New color of the ball
+    """
+    if ball == first:
+        return second
+    if ball == second:
+        return first
+    return ball
+
+
+class State:
+    __slots__ = ('tubes', 'capacity', 'num_of_colors', 'ball_bits')
+
+    def __init__(self, tubes: tuple, capacity: int = 4, num_of_colors: int = None, ball_bits: int = None) -> None:
+        """Initializes State, a compact and immutable gamestate
+
+        Each tube is a tuple with its balls, from the bottom to the top.
+        Applying a move creates a new State that shares the untouched
+        tubes with the old one, so it's much cheaper than cloning a Game.
 
+        Args:
+            tubes (tuple): Tuple with the balls of each tube
+            capacity (int, optional): Capacity of the tubes. Defaults to 4.
+            num_of_colors (int, optional): Number of different colors. Calculated if None.
+            ball_bits (int, optional): Number of bits of a ball in the state key. Calculated if None.
+        """
+        self.tubes = tubes
+        self.capacity = capacity
+        if num_of_colors is None or ball_bits is None:
+            balls = set(ball for tube in tubes for ball in tube)
+            if num_of_colors is None:
+                num_of_colors = len(balls)
+            if ball_bits is None:
+                ball_bits = max(max(balls, default=0).bit_length(), 1)
+        self.num_of_colors = num_of_colors
+        self.ball_bits = ball_bits
+
+    @staticmethod
+    def from_game(game: Game):
+        """Creates a State from a Game
+
+        Args:
+            game (Game): Gamestate to convert
+
+        Returns:
+            State: Compact gamestate
+        """
+        capacity = game.tubes[0].capacity if game.tubes else 4
+        return State(tuple(tuple(tube.balls) for tube in game.tubes), capacity,
+                     game.num_of_colors, game.ball_bits)
+
+    def to_game(self):
+        """Creates a Game from this State
+
+        Returns:
+            Game: Gamestate with new Tubes
+        """
+        return Game([Tube(list(balls), self.capacity) for balls in self.tubes])
+
+    def finished(self):
+        """Checks if the game is finished
+
+        Returns:
+            boolean: True if the game is finished, False otherwise
+        """
+        return tubes_finished(self.tubes, self.capacity, self.num_of_colors)
+
+    def expand(self, prune: bool = False, last_move: tuple = None, pruned: dict = None):
+        """Expand the current state, in the same order as Game.expand
+
+        Args:
+            prune (bool, optional): Remove useless moves and order the others, see prune_moves. Defaults to False.
+            last_move (tuple, optional): Move that led to this state, used when pruning. Defaults to None.
+            pruned (dict, optional): Counts of pruned moves by reason, updated when pruning. Defaults to None.
+
+        Returns:
+            list: List of possible moves
+        """
+        moves = find_moves(self.tubes, self.capacity)
+        if prune:
+            moves = self.prune_moves(moves, last_move, pruned)
+        return moves
+
+    def prune_moves(self, moves: list, last_move: tuple = None, pruned: dict = None):
+        """Remove the moves that are useless or symmetric to another move, see prune_moves
+
+        Args:
+            moves (list): Possible moves
+            last_move (tuple, optional): Move that led to this state. Defaults to None.
+            pruned (dict, optional): Counts of pruned moves by reason, updated here. Defaults to None.
+
+        Returns:
+            list: Useful moves, best first
+        """
+        return prune_moves(self.tubes, self.capacity, moves, last_move, pruned)
+
+    def apply_move(self, from_i: int, to_i: int, count: int = 1):
+        """Moves balls from a tube to another
+
+        Args:
+            from_i (int): Index of the tube to remove the balls
+            to_i (int): Index of the tube to put the balls
+            count (int, optional): Number of balls to move, all of them must have
+                the same color. Defaults to 1.
+
+        Returns:
+            State: New state after the move, None if the move isn't valid
+        """
+        from_balls = self.tubes[from_i]
+        to_balls = self.tubes[to_i]
+        if len(from_balls) < count or len(to_balls) + count > self.capacity or (
+                to_balls and from_balls[-1] != to_balls[-1]) or from_balls[-count:].count(from_balls[-1]) != count:
+            return None
+
+        tubes = list(self.tubes)
+        tubes[from_i] = from_balls[:-count]
+        tubes[to_i] = to_balls + from_balls[-count:]
+        return State(tuple(tubes), self.capacity, self.num_of_colors, self.ball_bits)
+
+    def pour_size(self, from_i: int, to_i: int):
+        """Number of balls moved when pouring a tube into another, like in the real game
+
+        All the balls of the same color on the top of the tube are moved,
+        as many as fit in the other tube.
+
+        Args:
+            from_i (int): Index of the tube to remove the balls
+            to_i (int): Index of the tube to put the balls
+
+        Returns:
+            int: Number of balls to move
+        """
+        from_balls = self.tubes[from_i]
+        run = 1
+        while run < len(from_balls) and from_balls[-run - 1] == from_balls[-1]:
+            run += 1
+        return min(run, self.capacity - len(self.tubes[to_i]))
+
+    def key(self):
+        """Integer key of the state, the same as Game.key
+
+        Returns:
+            int: Key of the state
+        """
+        return pack_tubes(self.tubes, self.capacity, self.ball_bits)
+
+    def canonical_tubes(self, relabel_colors: bool = False):
+        """Tubes of the state in a canonical order
+
+        The order of the tubes doesn't change which moves are possible,
+        so states that only differ in the order of the tubes are
+        equivalent. Sorting the tubes gives the same tubes for all of them.
+
+        With relabel_colors, the colors are also renamed, so states that
+        only differ in the colors are equivalent too. That is only true
+        when solvability is what matters, since the tubes are no longer the
+        ones in the game. See relabel_tubes.
+
+        Args:
+            relabel_colors (bool, optional): Also ignore which color is which. Defaults to False.
+
+        Returns:
+            tuple: Sorted tuple with the balls of each tube
+        """
+        if not relabel_colors:
+            return tuple(sorted(self.tubes))
+        colors = {ball for balls in self.tubes for ball in balls}
+        return relabel_tubes(self.tubes, refine_colors(self.tubes, {color: 0 for color in colors}))
+
+    def canonical_key(self, relabel_colors: bool = False):
+        """Integer key of the state, independent of the order of the tubes
+
+        Args:
+            relabel_colors (bool, optional): Also ignore which color is which. Defaults to False.
+
+        Returns:
+            int: Canonical key of the state
+        """
+        ball_bits = max(self.num_of_colors.bit_length(), 1) if relabel_colors else self.ball_bits
+        return pack_tubes(self.canonical_tubes(relabel_colors), self.capacity, ball_bits)
+
+    def __eq__(self, other):
+        """Check if two states have the same balls in the same tubes
+
+        Args:
+            other (State): State to compare
+
+        Returns:
+            boolean: True if both states are the same, False otherwise
+        """
+        return self.tubes == other.tubes
+
+    def __hash__(self):
+        """Hash Function
+
+        Returns:
+            int: Hash of the tubes
+        """
+        return hash(self.tubes)
+
+    def print(self):
+        """Print the state
+        """
+        self.to_game().print()
@@ -1,9 +1,10 @@
-import functools
 import json
 import pygame
 import time
 import random
 import copy
+import queue
+import threading
 
 from game.endscreen import EndScreen
 from game.menus import Menu, SettingsMenu, GameMenu
@@ -12,44 +13,18 @@ from game.score import Score
 from game.timer import Timer
 from game.utils import load_sprite, text_to_sprite
 
-from solver import Algorithm, solver, ids
+from solver import Algorithm
+from portfolio import portfolio
+from solutiondb import SolutionDB
+from deadstates import DeadStates
+from game.hints import HintEngine
 from graph import Graph, Node, Tube, Game
-from threading import Thread
+from tube import State
 
 
 # level box size: width-200 height-100
 
 
-def timeout(timeout):
-    def deco(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            res = [Exception('function [%s] timeout [%s seconds] exceeded!' % (func.__name__, timeout))]
-
-            def newFunc():
-                try:
-                    res[0] = func(*args, **kwargs)
-                except Exception as e:
-                    res[0] = e
-
-            t = Thread(target=newFunc)
-            t.daemon = True
-            try:
-                t.start()
-                t.join(timeout)
-            except Exception as je:
-                print('error starting thread')
-                raise je
-            ret = res[0]
-            if isinstance(ret, BaseException):
-                raise ret
-            return ret
-
-        return wrapper
-
-    return deco
-
-
 # Global Variables
 
 mouse_timeout = 0.15
@@ -69,6 +44,25 @@ for level in levels:
         new_tubes.append(Tube(tube))
     levels[level] = new_tubes
 
+# Algorithm and max depth of each option of the settings menu
+watch_algorithms = [
+    (Algorithm.A_STAR, 30),
+    (Algorithm.GREEDY, 30),
+    (Algorithm.DFS, 60),
+    (Algorithm.BFS, 15),
+    (Algorithm.IDS, 60),
+    (Algorithm.ARA_STAR, 60)
+]
+
+# Time limit to find a solution, in seconds
+solver_timeout = 20
+
+# Solutions found in previous runs, for the hints and the watch mode
+solutions = SolutionDB('solutions.db')
+
+# States that can't be solved, shared by the hints of the whole session
+dead_states = DeadStates()
+
 ball_dict = {
     1: "blueBall.png",
     2: "pinkBall.png",
@@ -186,9 +180,13 @@ class UI:
         self.state = "MAINMENU"
         self.algorithm = 0
         self.hint_available = True
+        self.hints = HintEngine(solutions, solver_timeout, dead_states)
         self.auto_solving = False
         self.paused = False
         self.auto_speed = 0
+        self.solvedPath = None
+        self.watch_results = queue.Queue()
+        self.watch_cancel = threading.Event()
         self.init_screen()
         self.load_other()
         self.build_menu()
@@ -445,8 +443,6 @@ class UI:
         elif self.check_quit(mouse_pos):
             self.return_to_menu()
         elif self.check_hint(mouse_pos):
-            '''solver_thread = Thread(target=self.update_hint)
-            solver_thread.start()'''
             self.update_hint()
             self.display_hint = True
             self.dj.click_hint()
@@ -573,7 +569,11 @@ class UI:
                 self.check_solve_cols(mouse_pos)
             else:
                 self.check_run_cols(mouse_pos)
+        if not self.auto_solving and self.state == "RUNNING":
+            self.update_hint()
         if self.auto_solving and not self.solver_failed:
+            self.update_solved()
+        if self.auto_solving and not self.solver_failed and self.solvedPath is not None:
             if self.solve_timer.check_timer() and not self.paused:
                 self.play_solved()
 
@@ -625,10 +625,8 @@ class UI:
         self.state = "RUNNING"
         self.moves = 0
         self.selected = -1
-        '''
-        solver_thread = Thread(target=self.update_hint)
-        solver_thread.start()
-        '''
+        self.hint_available = True
+        self.hints.update(self.cur_game)
         self.saved_moves = []
         self.move_num = Score([1256, 45])
         self.undo_num = Score([1256, 115])
@@ -641,6 +639,8 @@ class UI:
 
     def return_to_menu(self):
         self.dj.in_menu()
+        self.hints.stop()
+        self.watch_cancel.set()
         self.state = "GAMEMENU"
         self.selected = -1
 
@@ -648,6 +648,8 @@ class UI:
         self.state = "SETTINGS"
 
     def end_game(self):
+        self.hints.stop()
+        self.watch_cancel.set()
         self.state = "END"
         self.selected = -1
 
@@ -668,10 +670,7 @@ class UI:
         if self.tubes[tube].add_ball(ball):
             self.dj.complete_tube()
         self.saved_moves.append([self.selected, tube])
-        '''
-        solver_thread = Thread(target=self.update_hint)
-        solver_thread.start()
-        '''
+        self.hints.update(self.cur_game, (self.selected, tube))
         self.deselect()
         self.display_hint = False
 
@@ -687,41 +686,57 @@ class UI:
 
         ball = self.tubes[move[1]].remove_ball()
         self.tubes[move[0]].add_ball(ball)
-        '''
-        solver_thread = Thread(target=self.update_hint)
-        solver_thread.start()
-        '''
-
-    @timeout(20)
-    def get_result(self, init_state):
-
-        if self.algorithm == 0:
-            return solver(init_state, Algorithm.A_STAR, 30)
-        elif self.algorithm == 1:
-            return solver(init_state, Algorithm.GREEDY, 30)
-        elif self.algorithm == 2:
-            return solver(init_state, Algorithm.DFS, 60)
-        elif self.algorithm == 3:
-            return solver(init_state, Algorithm.BFS, 15)
-        elif self.algorithm == 4:
-            return ids(init_state, 60)
+        self.hints.update(self.cur_game)
+
+    def get_result(self, init_state, on_solution=None, cancel=None):
+        # Tagged by algorithm, so the watch mode shows the chosen algorithm's solution
+        algorithm = watch_algorithms[self.algorithm]
+        return solutions.solve(init_state, lambda x: portfolio(x, [algorithm], solver_timeout, cancel=cancel,
+                                                               on_solution=on_solution), algorithm[0].name)
 
     def startSolved(self):
-        init_state = Node(self.cur_game)
+        # The search runs in the background, so an anytime algorithm like ARA*
+        # plays its first solution at once and switches to the better ones
+        self.solvedPath = None
+        self.curNode = 0
+        self.hide_hint_arrows()
+        self.watch_cancel.set()
+        self.watch_cancel = threading.Event()
+        self.watch_results = queue.Queue()
+        thread = threading.Thread(target=self.search_solved, daemon=True,
+                                  args=(Node(self.cur_game), self.watch_results, self.watch_cancel))
+        thread.start()
+
+    def search_solved(self, init_state, results, cancel):
+        def improved(goal, bound):
+            results.put(Graph().path(goal))
+
         try:
-            result = self.get_result(init_state)
-            if result[1] is None:
-                self.solver_failed = True
-                self.display_hint = False
-                self.hide_hint_arrows()
-                return
-            self.display_hint = True
-            self.solvedPath = result[0].path(result[1])
-            self.curNode = 0
+            result = self.get_result(init_state, improved, cancel)
+            results.put(result[0].path(result[1]) if result[1] is not None else None)
         except:
-            self.solver_failed = True
-            self.display_hint = False
-            self.hide_hint_arrows()
+            results.put(None)
+
+    def update_solved(self):
+        while not self.watch_results.empty():
+            path = self.watch_results.get()
+            if path is None:
+                if self.solvedPath is None:
+                    self.solver_failed = True
+                    self.display_hint = False
+                    self.hide_hint_arrows()
+                continue
+            # Switch to a shorter solution if it goes through the current state
+            state = State.from_game(self.cur_game)
+            for i, node in enumerate(path):
+                if node.state.tubes == state.tubes:
+                    if self.solvedPath is None or len(path) - i < len(self.solvedPath) - self.curNode:
+                        self.solvedPath = path
+                        self.curNode = i
+                        next_move = self.get_next_move()
+                        if next_move[0] != -2:
+                            self.update_hint_arrows(next_move)
+                    break
 
     def play_solved(self):
 
@@ -757,17 +772,16 @@ class UI:
 
     # Hint functions
     def update_hint(self):
-        init_state = Node(self.cur_game)
-        result = solver(init_state, Algorithm.A_STAR, 30)
-        if result[1] is None:
+        if self.hints.failed:
             self.hint_available = False
             self.hide_hint_arrows()
             return
-        path = result[0].path(result[1])
-        if len(path) > 1:
-            self.hint_available = True
-            hint = self.find_differences(path[1])
-            self.update_hint_arrows(hint)
+        self.hint_available = True
+        hint = self.hints.hint()
+        if hint is None:
+            self.hide_hint_arrows()
+            return
+        self.update_hint_arrows(hint)
 
     def update_hint_arrows(self, hint):
         self.hint_up.sprite.rect.left = self.tubes[hint[0]].coords[0] + 5
@@ -818,18 +832,19 @@ class UI:
         return [tube_from, tube_to]
 
 
-pygame.init()
+if __name__ == "__main__":
+    pygame.init()
 
-game = UI()
+    game = UI()
 
-pygame.display.set_caption('Ballsort')
+    pygame.display.set_caption('Ballsort')
 
-while game.active:
-    game.run()
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            game.active = False
+    while game.active:
+        game.run()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                game.active = False
 
-    pygame.display.update()
+        pygame.display.update()
 
-pygame.quit()
+    pygame.quit()
@@ -0,0 +1,179 @@
+import numpy as np
+
+from graph import Graph, Node
+from solver import path_to_node
+from stats import SearchStats
+
+
+def vector_bfs(start_node: Node, max_depth: int = 5000, prune: bool = True, stats: SearchStats = None):
+    """Breadth-First Search that expands a whole depth at a time with numpy
+
+    The states of a depth are an int8 array of shape (states, tubes,
+    capacity), with 0 for an empty place, plus the height of each tube.
+    The legal moves, the children, the goal test and the duplicate
+    detection are array operations over all of them. The visited states
+    are kept as a sorted array of packed canonical keys, and each depth
+    only keeps the parent and the move of its states, to build the path.
+
+    Args:
+        start_node (Node): Start node
+        max_depth (int, optional): Maximum depth to search. Defaults to 5000.
+        prune (bool, optional): Don't move balls out of completed tubes, nor from a tube with a
+            single color to an empty one. Defaults to True.
+        stats (SearchStats, optional): Instrumentation of the search, saved in graph.stats. Defaults to None.
+
+    Returns:
+        tuple: graph and the final solution, if found
+    """
+    graph = Graph()
+    graph.stats = stats
+    state = start_node.state
+    capacity = state.capacity
+    num_tubes = len(state.tubes)
+
+    # Colors are renamed to 1..n, so 0 is an empty place
+    labels = {}
+    balls = np.zeros((1, num_tubes, capacity), dtype=np.int8)
+    heights = np.zeros((1, num_tubes), dtype=np.int8)
+    for i, tube in enumerate(state.tubes):
+        for j, ball in enumerate(tube):
+            balls[0, i, j] = labels.setdefault(ball, len(labels) + 1)
+        heights[0, i] = len(tube)
+    packer = KeyPacker(num_tubes, capacity, len(labels))
+
+    sources, targets = [], []
+    for from_i in range(num_tubes):
+        for to_i in range(num_tubes):
+            if from_i != to_i:
+                sources.append(from_i)
+                targets.append(to_i)
+    sources = np.array(sources)
+    targets = np.array(targets)
+
+    visited = np.sort(packer.keys(balls))
+    # Parent index and move of every state of each depth
+    layers = []
+
+    for depth in range(max_depth + 1):
+        goals = np.flatnonzero(finished(balls, heights, capacity))
+        if len(goals) > 0:
+            moves = []
+            index = int(goals[0])
+            for parents, from_moves, to_moves in reversed(layers):
+                moves.append((int(from_moves[index]), int(to_moves[index])))
+                index = int(parents[index])
+            moves.reverse()
+            print("Found goal!")
+            return graph, path_to_node(start_node, moves)
+        if depth == max_depth or len(balls) == 0:
+            break
+
+        graph.discard(len(balls))
+        if stats is not None:
+            stats.expanded(depth, graph, len(balls))
+
+        rows = np.arange(len(balls))[:, None]
+        tops = balls[rows, np.arange(num_tubes), np.maximum(heights - 1, 0)]
+        from_heights, to_heights = heights[:, sources], heights[:, targets]
+        legal = (from_heights > 0) & (to_heights < capacity) & \
+                ((to_heights == 0) | (tops[:, sources] == tops[:, targets]))
+        if prune:
+            single = uniform(balls, heights)
+            useless = (single & (heights == capacity))[:, sources] | \
+                      (single[:, sources] & (to_heights == 0))
+            legal &= ~useless
+
+        parents, pairs = np.nonzero(legal)
+        from_moves, to_moves = sources[pairs], targets[pairs]
+        children = balls[parents]
+        child_heights = heights[parents]
+        child_rows = np.arange(len(parents))
+        from_places = child_heights[child_rows, from_moves] - 1
+        to_places = child_heights[child_rows, to_moves]
+        children[child_rows, to_moves, to_places] = children[child_rows, from_moves, from_places]
+        children[child_rows, from_moves, from_places] = 0
+        child_heights[child_rows, from_moves] -= 1
+        child_heights[child_rows, to_moves] += 1
+
+        keys = packer.keys(children)
+        keys, first = np.unique(keys, return_index=True)
+        found = np.searchsorted(visited, keys)
+        seen = found < len(visited)
+        seen[seen] = visited[found[seen]] == keys[seen]
+        new = first[~seen]
+        new.sort()
+        visited = np.insert(visited, found[~seen], keys[~seen])
+
+        graph.generate(len(parents), len(new))
+        balls, heights = children[new], child_heights[new]
+        layers.append((parents[new], from_moves[new], to_moves[new]))
+
+    return graph, None
+
+
+def uniform(balls, heights):
+    """Check which tubes only have balls of a single color
+
+    Args:
+        balls (ndarray): Balls of each state, with shape (states, tubes, capacity)
+        heights (ndarray): Number of balls of each tube, with shape (states, tubes)
+
+    Returns:
+        ndarray: True for the tubes with a single color or empty, with shape (states, tubes)
+    """
+    places = np.arange(balls.shape[2])
+    same = (balls == balls[:, :, :1]) | (places >= heights[:, :, None])
+    return same.all(axis=2)
+
+
+def finished(balls, heights, capacity: int):
+    """Goal test of every state
+
+    Args:
+        balls (ndarray): Balls of each state, with shape (states, tubes, capacity)
+        heights (ndarray): Number of balls of each tube, with shape (states, tubes)
+        capacity (int): Capacity of the tubes
+
+    Returns:
+        ndarray: True for the solved states
+    """
+    done = (heights == 0) | ((heights == capacity) & uniform(balls, heights))
+    return done.all(axis=1)
+
+
+class KeyPacker:
+    def __init__(self, num_tubes: int, capacity: int, colors: int) -> None:
+        """Packs the states into canonical keys that can be sorted and compared
+
+        Each tube is a number with a digit for each place, in base
+        colors + 1. The tubes of a state are sorted, so the order of the
+        tubes doesn't matter, and packed in as many 64 bit words as needed.
+        The words of a key are viewed as a single opaque value.
+
+        Args:
+            num_tubes (int): Number of tubes
+            capacity (int): Capacity of the tubes
+            colors (int): Number of colors
+        """
+        self.weights = (colors + 1) ** np.arange(capacity, dtype=np.int64)
+        self.bits = int((colors + 1) ** capacity - 1).bit_length()
+        if self.bits > 63:
+            raise ValueError('A tube of capacity {} with {} colors doesn\'t fit in 64 bits'.format(capacity, colors))
+        self.per_word = 64 // self.bits
+        self.words = -(-num_tubes // self.per_word)
+
+    def keys(self, balls):
+        """Canonical keys of the states
+
+        Args:
+            balls (ndarray): Balls of each state, with shape (states, tubes, capacity)
+
+        Returns:
+            ndarray: Key of each state
+        """
+        codes = np.sort((balls.astype(np.int64) * self.weights).sum(axis=2), axis=1).astype(np.uint64)
+        words = np.zeros((len(balls), self.words), dtype=np.uint64)
+        for i in range(codes.shape[1]):
+            word, shift = divmod(i, self.per_word)
+            words[:, word] |= codes[:, i] << np.uint64(shift * self.bits)
+        return words.view(np.dtype((np.void, 8 * self.words))).ravel()
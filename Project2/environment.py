@@ -18,12 +18,13 @@ class Environment(gym.Env):
     states = {}
     i = 0
 
-    def __init__(self, game):
+    def __init__(self, game, capacity=4):
         self.initial_state = copy.deepcopy(game)
         self.n_tubes = len(game)
-        self.state = tube.Game(game)
+        self.capacity = capacity
+        self.state = tube.Game(game, capacity)
         self.action_space = gym.spaces.Discrete(pow(len(game), 2))  # Combinacoes de N, 2 a 2 (N = numero de tubos)
-        self.observation_space = tube.Game(game)  # puzzle
+        self.observation_space = tube.Game(game, capacity)  # puzzle
         self.put_dict(self.state)
 
     def step(self, action):
@@ -34,7 +35,7 @@ class Environment(gym.Env):
         return state, reward, done, info
 
     def reset(self):
-        return tube.Game(copy.deepcopy(self.initial_state))
+        return tube.Game(copy.deepcopy(self.initial_state), self.capacity)
 
     def put_dict(self, o):
         for state in self.states.keys():
@@ -122,10 +122,11 @@ class Tube:
 
 
 class Game(gym.Space):
-    def __init__(self, tubes: list) -> None:
+    def __init__(self, tubes: list, capacity: int = 4) -> None:
+        self.capacity = capacity
         self.tubes = []
         for tube in tubes:
-            self.tubes.append(Tube(tube))
+            self.tubes.append(Tube(tube, capacity))
             self.num_of_colors = self.calculate_colors()
         
         self.n_tubes = len(self.tubes)
@@ -138,10 +139,11 @@ class Game(gym.Space):
             int: number of states
         """
         # All balls of the state
-        balls = [x for x in range(1, self.num_of_colors + 1)] * 4
+        balls = [x for x in range(1, self.num_of_colors + 1)] * self.capacity
 
         # All possible tube configurations
-        configurations = [x for x in variations([0, 1, 2, 3, 4], self.n_tubes, True) if sum(x) == 4 * self.num_of_colors]
+        configurations = [x for x in variations(list(range(self.capacity + 1)), self.n_tubes, True)
+                          if sum(x) == self.capacity * self.num_of_colors]
 
         balls_permutations = multiset_permutations(balls)
 
@@ -236,7 +238,7 @@ class Game(gym.Space):
     def print(self):
         """Print a game state
         """
-        for places in range(3, -1, -1):
+        for places in range(self.capacity - 1, -1, -1):
             for tube in self.tubes:
                 tube.print(places)
             print("")
@@ -267,7 +269,7 @@ class Game(gym.Space):
 
             idx = next((i for i, v in enumerate(balls) if v != balls[0]), -1)
             if idx == -1:
-                if len(balls) == 4:
+                if len(balls) == self.capacity:
                     reward += 5
                 else:
                     reward += len(balls)